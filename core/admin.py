@@ -1,5 +1,91 @@
-from django.contrib import admin
-from .models import HeroSlide, Category, Product, SiteInfo,Service,ProductImage
+import hashlib
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import HeroSlide, Category, Product, SiteInfo,Service,ProductImage,Review, Order, OrderItem, Contact, ProductIndex
+from . import bulk, images, orders, search
+from .cache import site_cache
+
+# -----------------------
+# OUTILS COMMUNS
+# -----------------------
+class CachedCountPaginator(Paginator):
+    """
+    Paginateur des listes de l'admin : le COUNT(*) d'une liste (filtres
+    compris) est mis en cache, sous une clé qui contient la version du
+    modèle dans site_cache. Il n'est refait qu'après une modification du
+    modèle, et non à chaque page affichée.
+    """
+    timeout = 10 * 60
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.sha1(f"{sql}|{params}".encode()).hexdigest()
+        key = f"admin_count:{queryset.model._meta.label_lower}:{site_cache.version(queryset.model)}:{digest}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.timeout)
+        return count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Liste paginée sans COUNT(*) à chaque page : ni total non filtré, ni décompte répété."""
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
+class BulkActionsAdmin(ScalableAdmin):
+    """Liste avec actions de masse (core/bulk.py) et suivi de leurs tâches de fond."""
+
+    def get_urls(self):
+        name = f"{self.opts.app_label}_{self.opts.model_name}_bulk_job"
+        return [
+            path('bulk-jobs/<str:job_id>/', self.admin_site.admin_view(self.bulk_job_view), name=name),
+        ] + super().get_urls()
+
+    def bulk_job_view(self, request, job_id):
+        """Avancement d'une tâche de fond, en JSON."""
+        status = bulk.job_status(job_id)
+        if status is None:
+            raise Http404("Tâche inconnue ou purgée")
+        return JsonResponse(status)
+
+    def run_bulk(self, request, queryset, label, operation, *args):
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        job_id = bulk.run(label, pks, operation, [self.model], *args)
+        if job_id is None:
+            self.message_user(request, f"{label} : {len(pks)} ligne(s) modifiée(s).", messages.SUCCESS)
+            return
+        url = reverse(f"admin:{self.opts.app_label}_{self.opts.model_name}_bulk_job", args=[job_id])
+        self.message_user(request, format_html(
+            '{} : {} ligne(s) en tâche de fond, avancement sur <a href="{}">{}</a>.', label, len(pks), url, url,
+        ), messages.INFO)
+
+
+def thumbnail(field_file, height):
+    """Miniature d'une image, servie depuis sa déclinaison 'thumb' (192 px) quand elle existe."""
+    if not field_file:
+        return "-"
+    url = field_file.url
+    if images.has_derivatives(field_file.name, 'thumb'):
+        url = images.fallback_url(field_file.name, 'thumb')
+    return format_html(
+        '<img src="{}" alt="" style="height:{}px; width:auto; border-radius:6px;" loading="lazy">',
+        url, height,
+    )
+
 
 # -----------------------
 # HERO SLIDES ADMIN
@@ -26,10 +112,7 @@ class HeroSlideAdmin(admin.ModelAdmin):
     )
 
     def preview_image(self, obj):
-        if obj.image:
-            return f'<img src="{obj.image.url}" style="width: 300px; height:auto; border-radius: 10px;" />'
-        return "-"
-    preview_image.allow_tags = True
+        return thumbnail(obj.image, 60)
     preview_image.short_description = "Aperçu"
 
     def subtitle_short(self, obj):
@@ -64,16 +147,14 @@ class SiteInfoAdmin(admin.ModelAdmin):
 
     def logo_preview(self, obj):
         if obj.logo:
-            return f'<img src="{obj.logo.url}" style="height:50px;"/>'
+            return format_html('<img src="{}" style="height:50px;"/>', obj.logo.url)
         return "-"
-    logo_preview.allow_tags = True
     logo_preview.short_description = "Logo"
 
     def favicon_preview(self, obj):
         if obj.favicon:
-            return f'<img src="{obj.favicon.url}" style="height:30px;"/>'
+            return format_html('<img src="{}" style="height:30px;"/>', obj.favicon.url)
         return "-"
-    favicon_preview.allow_tags = True
     favicon_preview.short_description = "Favicon"
 
 # -----------------------
@@ -92,17 +173,140 @@ class ProductImageInline(admin.TabularInline):
     fields = ('image', 'alt_text', 'order')
     show_change_link = True
 
+class ProductActionForm(ActionForm):
+    percentage = forms.DecimalField(
+        required=False, decimal_places=2, label="Pourcentage",
+        help_text="Pour l'action de changement de prix (-10 pour une baisse de 10 %)",
+    )
+
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock', 'is_active', 'is_featured')
+class ProductAdmin(BulkActionsAdmin):
+    list_display = ('preview_image', 'name', 'category', 'price', 'stock', 'is_active', 'is_featured', 'rating_avg', 'rating_count')
+    list_display_links = ('preview_image', 'name')
     list_filter = ('category', 'is_active', 'is_featured')
+    list_select_related = ('category',)
     search_fields = ('name',)
     prepopulated_fields = {'slug': ('name',)}
     inlines = [ProductImageInline]  # ajoute les images supplémentaires ici
+    action_form = ProductActionForm
+    actions = ['activate', 'deactivate', 'feature', 'unfeature', 'reprice']
+
+    @admin.action(description="Activer les produits sélectionnés")
+    def activate(self, request, queryset):
+        self.run_bulk(request, queryset, "Activation", bulk.set_active, True)
+
+    @admin.action(description="Désactiver les produits sélectionnés")
+    def deactivate(self, request, queryset):
+        self.run_bulk(request, queryset, "Désactivation", bulk.set_active, False)
+
+    @admin.action(description="Mettre en vedette")
+    def feature(self, request, queryset):
+        self.run_bulk(request, queryset, "Mise en vedette", bulk.set_featured, True)
+
+    @admin.action(description="Retirer de la vedette")
+    def unfeature(self, request, queryset):
+        self.run_bulk(request, queryset, "Retrait de la vedette", bulk.set_featured, False)
+
+    @admin.action(description="Changer les prix (pourcentage ci-contre)")
+    def reprice(self, request, queryset):
+        field = forms.DecimalField(min_value=-90, max_value=500, decimal_places=2)
+        try:
+            percentage = field.clean(request.POST.get('percentage'))
+        except ValidationError:
+            self.message_user(request, "Indiquez un pourcentage entre -90 et 500.", messages.ERROR)
+            return
+        self.run_bulk(request, queryset, f"Prix {percentage:+} %", bulk.reprice, percentage)
+
+    def get_queryset(self, request):
+        # La description (texte riche) n'est pas affichée dans la liste
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('changelist'):
+            queryset = queryset.defer('description', 'description_html')
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        # Recherche plein texte (FTS5) de l'index de la boutique plutôt qu'un LIKE '%...%'
+        if not search_term.strip():
+            return queryset, False
+        entries = search.search(ProductIndex.objects.all(), search_term)
+        return queryset.filter(pk__in=entries.values('product_id')), False
+
+    def preview_image(self, obj):
+        return thumbnail(obj.image, 40)
+    preview_image.short_description = "Image"
 
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
     list_display = ('title', 'order', 'is_active')
     list_editable = ('order', 'is_active')
-    search_fields = ('title', 'description')
\ No newline at end of file
+    search_fields = ('title', 'description')
+
+
+@admin.register(Review)
+class ReviewAdmin(ScalableAdmin):
+    list_display = ('product', 'name', 'rating', 'is_approved', 'created_at')
+    list_editable = ('is_approved',)
+    list_filter = ('is_approved', 'rating')
+    list_select_related = ('product',)
+    raw_id_fields = ('product',)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ('product_name', 'unit_price', 'quantity')
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(Order)
+class OrderAdmin(ScalableAdmin):
+    list_display = ('__str__', 'email', 'total', 'status', 'created_at', 'expires_at')
+    list_filter = ('status', 'shipping_method')
+    search_fields = ('email', 'last_name')
+    # Le statut et les montants ne changent que par core/orders.py, qui tient le stock à jour
+    readonly_fields = ('reference', 'user', 'status', 'subtotal', 'shipping_cost', 'total', 'created_at', 'expires_at')
+    inlines = [OrderItemInline]
+    actions = ['confirm_payments', 'cancel_orders']
+
+    @admin.action(description="Confirmer le paiement des commandes en attente")
+    def confirm_payments(self, request, queryset):
+        count = sum(orders.confirm_payment(order) for order in queryset.filter(status=Order.PENDING))
+        self.message_user(request, f"{count} paiement(s) confirmé(s).")
+
+    @admin.action(description="Annuler les commandes en attente (rend le stock)")
+    def cancel_orders(self, request, queryset):
+        count = orders.cancel_orders(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"{count} commande(s) annulée(s).")
+
+
+@admin.register(Contact)
+class ContactAdmin(BulkActionsAdmin):
+    list_display = ('name', 'email', 'subject', 'is_read', 'created_at')
+    list_filter = ('is_read',)
+    search_fields = ('email', 'name')
+    search_help_text = "Adresse email exacte, ou début du nom"
+    readonly_fields = ('name', 'email', 'subject', 'message', 'created_at')
+    actions = ['mark_read', 'mark_unread']
+
+    @admin.action(description="Marquer comme lus")
+    def mark_read(self, request, queryset):
+        self.run_bulk(request, queryset, "Marqués comme lus", bulk.mark_read, True)
+
+    @admin.action(description="Marquer comme non lus")
+    def mark_unread(self, request, queryset):
+        self.run_bulk(request, queryset, "Marqués comme non lus", bulk.mark_read, False)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Recherches servies par les index de core_contact : email exact ou préfixe du nom
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if '@' in term:
+            return queryset.filter(Q(email=term) | Q(email=term.lower())), False
+        prefixes = Q()
+        for prefix in {term, term.capitalize()}:
+            prefixes |= Q(name__gte=prefix, name__lt=prefix + '\U0010ffff')
+        return queryset.filter(prefixes), False
@@ -0,0 +1,118 @@
+"""
+Versions asynchrones des vues du catalogue (accueil, boutique, fiche produit),
+servies à la place de celles de core/views.py avec le réglage
+ASYNC_CATALOGUE_VIEWS (HERBAL_ASYNC_VIEWS=1, sous ASGI). Elles sont
+désactivées par défaut : tant que l'ORM asynchrone passe lui-même par des
+threads (SQLite), elles ne font qu'ajouter des changements de thread.
+
+Les données sont chargées avec l'ORM asynchrone (aget, async for...) et les
+données globales via les variantes asynchrones de core/cache.py. Le rendu
+du template passe par sync_to_async : les context processors et les
+fragments {% versioned_cache %} restent synchrones. Sous ASGI, Django
+attribue à chaque requête son propre thread pour ces appels (et pour
+l'ORM asynchrone) : le rendu ne bloque pas la boucle d'événements.
+
+Les filtres, la pagination et le contexte de la boutique sont partagés
+avec les vues synchrones.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import search
+from .cache import aget_categories, aget_services, site_cache
+from .conditional import conditional_page
+from .models import HeroSlide, Product, SlugRedirect
+from .pagination import akeyset_page, encode_cursor
+from .views import path_pagination, product_queryset, shop_context, shop_filters, shop_listing, similar_querysets
+
+_render = sync_to_async(render)
+
+
+async def _featured_products():
+    async def load():
+        queryset = Product.objects.for_listing().filter(is_active=True, is_featured=True)
+        return [product async for product in queryset.order_by('-created_at')[:6]]
+    return await site_cache.aget_or_set('home:best_sellers', [Product, 'core.category'], load)
+
+
+async def _hero_slides():
+    async def load():
+        return [slide async for slide in HeroSlide.objects.filter(is_active=True)]
+    return await site_cache.aget_or_set('home:hero_slides', [HeroSlide], load)
+
+
+@conditional_page('core.heroslide', 'core.product', 'core.category')
+async def home(request):
+    # Les données des sections sont mémorisées par site_cache : aucune
+    # requête en régime établi, comme les fragments de la vue synchrone
+    context = {
+        'services': await aget_services(active_only=True),
+        'hero_slides': await _hero_slides(),
+        'best_sellers': await _featured_products(),
+    }
+    return await _render(request, 'core/home.html', context)
+
+
+@conditional_page('core.product', 'core.category', 'core.review', 'core.productimage')
+async def product_detail(request, slug):
+    try:
+        product = await product_queryset().aget(slug=slug, is_active=True)
+    except Product.DoesNotExist:
+        new_slug = await SlugRedirect.objects.acurrent_slug(slug)
+        if new_slug is None:
+            raise Http404("Produit introuvable")
+        return redirect('product_detail', slug=new_slug, permanent=True)
+
+    older, newer = similar_querysets(product)
+    similar_products = [p async for p in older[:4]]
+    if len(similar_products) < 4:
+        similar_products += [p async for p in newer[:4 - len(similar_products)]]
+
+    reviews = []
+    if product.rating_count:
+        reviews = [review async for review in product.reviews.filter(is_approved=True)[:10]]
+
+    context = {
+        'product': product,
+        'similar_products': similar_products,
+        'reviews': reviews,
+    }
+    return await _render(request, 'core/product_detail.html', context)
+
+
+@conditional_page('core.product', 'core.category')
+async def shop(request, page=None):
+    # Disponibilité de FTS5 vérifiée (une fois par base) avant de construire la recherche
+    await sync_to_async(search.fts_available)()
+    entries, filters = shop_filters(request)
+
+    facets = await search.afacet_counts(entries, filters['selected_categories'])
+    products = shop_listing(entries, filters)
+
+    per_page = settings.SHOP_PAGE_SIZE
+    cursor = request.GET.get('cursor')
+    if cursor:
+        page = await akeyset_page(products, cursor, per_page)
+        page_range = []
+        next_cursor = page.next_cursor
+    else:
+        paginator = Paginator(products, per_page)
+        # Le COUNT(*) est fait ici, en asynchrone, plutôt que par le Paginator
+        paginator.count = await products.acount()
+        page = paginator.get_page(request.GET.get('page', page))
+        page.object_list = [entry async for entry in page.object_list]
+        page_range = paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1)
+        next_cursor = None
+        if (
+            page.has_next() and page.number >= settings.SHOP_KEYSET_FROM_PAGE
+            and not path_pagination(filters, cursor)
+        ):
+            next_cursor = encode_cursor(page[-1])
+
+    page.object_list = await search.ahydrate(page.object_list)
+
+    context = shop_context(page, page_range, cursor, next_cursor, await aget_categories(), facets, filters)
+    return await _render(request, 'core/shop.html', context)
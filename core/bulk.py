@@ -0,0 +1,152 @@
+"""
+Actions de masse de l'admin (produits, messages de contact).
+
+Chaque opération modifie un lot de clés primaires en une ou deux
+instructions UPDATE, sans save() ni signal par ligne. Une sélection
+d'au plus BULK_INLINE_LIMIT lignes est traitée pendant la requête ; au-delà,
+run() lance une tâche de fond (un thread du process) qui la traite par lots
+de BULK_CHUNK_SIZE, chaque lot dans sa propre transaction courte : le
+verrou d'écriture SQLite n'est jamais tenu longtemps. L'avancement est
+tenu dans une ligne BulkJob, lisible depuis tous les process
+(job_status()) ; une tâche 'running' sans avancement depuis
+BULK_JOB_STALE_AFTER secondes (thread tué avec son process) est signalée
+comme bloquée.
+
+Les UPDATE n'émettent pas de signal : l'index de la boutique est mis à
+jour dans la même transaction que les produits, et les versions de
+site_cache ne changent qu'une fois, à la fin de l'action.
+
+BULK_JOBS_EAGER = True exécute les tâches de fond dans l'appelant (tests).
+"""
+import logging
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import search
+from .cache import site_cache
+from .db import retry_on_locked
+from .models import BulkJob, Contact, Product, ProductIndex
+
+logger = logging.getLogger(__name__)
+
+# Tâches terminées conservées (secondes), purgées au lancement d'une autre
+JOB_RETENTION = 7 * 24 * 60 * 60
+
+
+# ------------------------
+# OPÉRATIONS (un lot de clés primaires)
+# ------------------------
+
+def set_active(pks, value):
+    with transaction.atomic():
+        Product.objects.filter(pk__in=pks).update(is_active=value, updated_at=timezone.now())
+        ProductIndex.objects.filter(product__in=pks).update(is_active=value)
+
+
+def set_featured(pks, value):
+    Product.objects.filter(pk__in=pks).update(is_featured=value, updated_at=timezone.now())
+
+
+def reprice(pks, percentage):
+    """Change les prix de `percentage` % (négatif pour une baisse), arrondis au centime."""
+    factor = 1 + Decimal(percentage) / 100
+    entries = ProductIndex.objects.filter(product__in=pks)
+    with transaction.atomic():
+        Product.objects.filter(pk__in=pks).update(
+            price=Round(F('price') * factor, 2), updated_at=timezone.now(),
+        )
+        entries.update(price=Subquery(Product.objects.filter(pk=OuterRef('product')).values('price')[:1]))
+        # Tranche recalculée à partir du nouveau prix (instruction suivante)
+        entries.update(price_bucket=search.price_bucket_expression())
+
+
+def mark_read(pks, value):
+    Contact.objects.filter(pk__in=pks).update(is_read=value)
+
+
+# ------------------------
+# EXÉCUTION ET SUIVI
+# ------------------------
+
+def job_status(job_id):
+    """
+    {'label', 'total', 'done', 'state', 'started_at', 'updated_at', 'stale'}
+    d'une tâche, ou None (inconnue ou purgée).
+    """
+    job = BulkJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    stale_before = timezone.now() - timedelta(seconds=settings.BULK_JOB_STALE_AFTER)
+    return {
+        'label': job.label,
+        'total': job.total,
+        'done': job.done,
+        'state': job.state,
+        'started_at': job.started_at.isoformat(),
+        'updated_at': job.updated_at.isoformat(),
+        'stale': job.state == BulkJob.RUNNING and job.updated_at < stale_before,
+    }
+
+
+@retry_on_locked
+def _publish(job_id, done, state):
+    # UPDATE seul : pas de signal, la version de BulkJob n'intéresse aucun cache
+    BulkJob.objects.filter(pk=job_id).update(done=done, state=state, updated_at=timezone.now())
+
+
+def run(label, pks, operation, models, *args):
+    """
+    Applique operation(lot, *args) à toutes les clés `pks`, puis change une
+    fois la version des `models`. Retourne None si l'action est terminée,
+    sinon l'identifiant de la tâche de fond.
+    """
+    pks = list(pks)
+    if len(pks) <= settings.BULK_INLINE_LIMIT:
+        retry_on_locked(operation)(pks, *args)
+        site_cache.bump(*models)
+        return None
+
+    job_id = uuid.uuid4().hex
+    retry_on_locked(_start)(job_id, label, len(pks))
+    if settings.BULK_JOBS_EAGER:
+        _run(job_id, label, pks, operation, models, args)
+    else:
+        threading.Thread(
+            target=_run, args=(job_id, label, pks, operation, models, args),
+            name=f"bulk-{job_id[:8]}", daemon=True,
+        ).start()
+    return job_id
+
+
+def _start(job_id, label, total):
+    BulkJob.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=JOB_RETENTION),
+    ).exclude(state=BulkJob.RUNNING).delete()
+    BulkJob.objects.create(id=job_id, label=label, total=total)
+
+
+def _run(job_id, label, pks, operation, models, args):
+    done, state = 0, BulkJob.FAILED
+    try:
+        for start in range(0, len(pks), settings.BULK_CHUNK_SIZE):
+            chunk = pks[start:start + settings.BULK_CHUNK_SIZE]
+            retry_on_locked(operation)(chunk, *args)
+            done += len(chunk)
+            _publish(job_id, done, BulkJob.RUNNING)
+        state = BulkJob.DONE
+    except Exception:
+        logger.exception("Échec de l'action de masse « %s » après %d ligne(s)", label, done)
+    finally:
+        # Les lots déjà validés sont visibles : on invalide même après un échec
+        site_cache.bump(*models)
+        _publish(job_id, done, state)
+        if not settings.BULK_JOBS_EAGER:
+            connections.close_all()
@@ -0,0 +1,165 @@
+"""
+Cache versionné pour les modèles peu modifiés (SiteInfo, Service...).
+
+Chaque modèle suivi possède un numéro de version, incrémenté par les signaux
+post_save / post_delete (voir core/signals.py). Une valeur en cache est
+mémorisée avec les versions des modèles dont elle dépend : tant qu'aucune de
+ces versions ne change, elle est servie sans aucune requête SQL.
+
+Les versions sont stockées dans le cache Django FRAGMENT_CACHE_ALIAS (mémoire
+locale par défaut, fichiers pour partager les versions entre plusieurs
+process) ; les valeurs, elles, restent dans la mémoire du process.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _now_version():
+    return time.time_ns()
+
+
+def model_label(model):
+    """Retourne le label d'un modèle, ex: 'core.siteinfo'."""
+    if isinstance(model, str):
+        return model.lower()
+    return model._meta.label_lower
+
+
+def _version_key(label):
+    return f"version:{label}"
+
+
+class VersionedCache:
+    """
+    Cache partagé entre les threads d'un même process.
+    Les versions sont des horodatages (ns) toujours croissants.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @property
+    def store(self):
+        return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+    def version(self, model):
+        return self.versions(model)[0]
+
+    def versions(self, *models):
+        keys = [_version_key(model_label(model)) for model in models]
+        found = self.store.get_many(keys)
+        for key in keys:
+            if key not in found:
+                # Version inconnue (démarrage, cache vidé ou purgé) : le contenu est
+                # considéré comme modifié "maintenant". Le premier process qui la
+                # fixe l'impose aux autres.
+                now = _now_version()
+                self.store.add(key, now, None)
+                found[key] = self.store.get(key, now)
+        return tuple(found[key] for key in keys)
+
+    def bump(self, *models):
+        """Invalide toutes les valeurs (et fragments) dépendant de ces modèles."""
+        with self._lock:
+            now = _now_version()
+            current = self.versions(*models)
+            self.store.set_many({
+                _version_key(model_label(model)): max(now, version + 1)
+                for model, version in zip(models, current)
+            }, None)
+
+    def get_or_set(self, key, models, loader):
+        """
+        Retourne la valeur associée à `key`, rechargée via `loader()` si
+        l'un des modèles de `models` a changé depuis la mise en cache.
+        """
+        # Les versions sont lues AVANT le chargement : si une sauvegarde a lieu
+        # pendant loader(), la prochaine lecture verra une version plus récente.
+        stamp = self.versions(*models)
+        entry = self._values.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._values[key] = (stamp, value)
+        return value
+
+    async def aget_or_set(self, key, models, loader):
+        """Variante asynchrone de get_or_set : `loader` est une coroutine."""
+        stamp = self.versions(*models)
+        entry = self._values.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        value = await loader()
+        with self._lock:
+            self._values[key] = (stamp, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.store.clear()
+
+
+site_cache = VersionedCache()
+
+
+# ------------------------
+# ACCÈS AUX DONNÉES GLOBALES
+# ------------------------
+
+def get_site_info():
+    """Retourne l'unique SiteInfo (ou None), sans requête en régime établi."""
+    from .models import SiteInfo
+    return site_cache.get_or_set('site_info', [SiteInfo], lambda: SiteInfo.objects.first())
+
+
+def get_categories():
+    """Retourne la liste de toutes les catégories."""
+    from .models import Category
+    return site_cache.get_or_set('categories', [Category], lambda: list(Category.objects.all()))
+
+
+def get_services(active_only=False):
+    """Retourne la liste des services (tous, ou seulement les actifs)."""
+    from .models import Service
+
+    def load():
+        services = Service.objects.all()
+        if active_only:
+            services = services.filter(is_active=True)
+        return list(services)
+
+    key = 'services:active' if active_only else 'services:all'
+    return site_cache.get_or_set(key, [Service], load)
+
+
+# Variantes asynchrones (core/async_views.py) : même cache, ORM asynchrone
+
+async def aget_site_info():
+    from .models import SiteInfo
+    return await site_cache.aget_or_set('site_info', [SiteInfo], SiteInfo.objects.afirst)
+
+
+async def aget_categories():
+    from .models import Category
+
+    async def load():
+        return [category async for category in Category.objects.all()]
+    return await site_cache.aget_or_set('categories', [Category], load)
+
+
+async def aget_services(active_only=False):
+    from .models import Service
+
+    async def load():
+        services = Service.objects.all()
+        if active_only:
+            services = services.filter(is_active=True)
+        return [service async for service in services]
+
+    key = 'services:active' if active_only else 'services:all'
+    return await site_cache.aget_or_set(key, [Service], load)
@@ -0,0 +1,294 @@
+"""
+Moteur de panier unique : session pour les visiteurs anonymes, modèles
+Cart/CartItem pour les utilisateurs connectés, avec la même interface.
+
+Format compact en session :
+    request.session['cart'] = {"<product_id>": [quantité, "prix unitaire"], ...}
+
+Les totaux se calculent sans toucher aux produits, au prix mémorisé lors de
+l'ajout ; seules les lignes détaillées (pages panier et commande) chargent
+les produits, en une requête. Une fois les lignes chargées, les totaux sont
+ceux des lignes affichées (prix courant) et la session est remise à jour.
+
+Le résumé (nombre d'articles, total) affiché dans l'en-tête est tenu à jour
+à chaque modification : dans la session pour les anonymes, dans le cache
+pour les utilisateurs connectés. Voir get_cart_summary().
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .cache import site_cache
+from .db import retry_on_locked
+from .models import Cart, CartItem, Product
+
+SESSION_KEY = 'cart'
+SUMMARY_SESSION_KEY = 'cart_summary'
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def _summary_cache_key(user_id):
+    # La version des produits fait partie de la clé : un changement de prix
+    # invalide les totaux en cache
+    return f"cart_summary:{user_id}:{site_cache.version(Product)}"
+
+
+class CartLine:
+    """Ligne de panier, identique pour la session et la base."""
+    __slots__ = ('product', 'quantity', 'unit_price')
+
+    def __init__(self, product, quantity, unit_price):
+        self.product = product
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @property
+    def total_price(self):
+        return self.unit_price * self.quantity
+
+
+class SessionCart:
+    """Panier d'un visiteur anonyme, stocké dans la session."""
+
+    def __init__(self, session):
+        self.session = session
+        self.data = session.get(SESSION_KEY, {})
+        self._lines = None
+        self._totals = None
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def lines(self):
+        """Lignes détaillées, produits chargés en une seule requête."""
+        if self._lines is None:
+            products = Product.objects.for_listing().in_bulk(
+                [int(pid) for pid in self.data]
+            )
+            self._lines = [
+                CartLine(products[int(pid)], quantity, products[int(pid)].price)
+                for pid, (quantity, _) in self.data.items()
+                if int(pid) in products
+            ]
+            self._totals = None
+            self._refresh_snapshot()
+        return self._lines
+
+    def _refresh_snapshot(self):
+        """Aligne la session sur les lignes chargées (prix modifiés, produits supprimés)."""
+        data = {str(line.product.pk): [line.quantity, str(line.unit_price)] for line in self._lines}
+        if data != self.data:
+            self.data = data
+            self.session[SESSION_KEY] = data
+            self.session[SUMMARY_SESSION_KEY] = [self.total_items, str(self.total_price)]
+            self.session.modified = True
+
+    def _compute_totals(self):
+        if self._totals is None:
+            if self._lines is not None:
+                self._totals = (
+                    sum(line.quantity for line in self._lines),
+                    sum((line.total_price for line in self._lines), Decimal('0')),
+                )
+            else:
+                self._totals = (
+                    sum(quantity for quantity, _ in self.data.values()),
+                    sum((Decimal(price) * quantity for quantity, price in self.data.values()), Decimal('0')),
+                )
+        return self._totals
+
+    @property
+    def total_items(self):
+        return self._compute_totals()[0]
+
+    @property
+    def total_price(self):
+        return self._compute_totals()[1]
+
+    def add(self, product, quantity=1):
+        pid = str(product.pk)
+        current = self.data.get(pid, [0, None])[0]
+        self.data[pid] = [current + quantity, str(product.price)]
+        self.save()
+
+    def update(self, product_id, quantity):
+        pid = str(product_id)
+        if pid in self.data:
+            self.data[pid][0] = quantity
+            self.save()
+
+    def remove(self, product_id):
+        if self.data.pop(str(product_id), None) is not None:
+            self.save()
+
+    def clear(self):
+        self.data = {}
+        self.save()
+
+    def save(self):
+        self._lines = None
+        self._totals = None
+        self.session[SESSION_KEY] = self.data
+        self.session[SUMMARY_SESSION_KEY] = [self.total_items, str(self.total_price)]
+        self.session.modified = True
+
+
+class DatabaseCart:
+    """Panier d'un utilisateur connecté (modèles Cart / CartItem)."""
+
+    def __init__(self, user):
+        self.user = user
+        self._cart = None
+        self._lines = None
+        self._totals = None
+
+    @property
+    def cart(self):
+        if self._cart is None:
+            self._cart, _ = Cart.objects.get_or_create(user=self.user)
+        return self._cart
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def lines(self):
+        """Lignes détaillées : une seule requête avec select_related."""
+        if self._lines is None:
+            items = CartItem.objects.filter(cart__user=self.user).select_related('product__category')
+            self._lines = [CartLine(item.product, item.quantity, item.product.price) for item in items]
+        return self._lines
+
+    def _compute_totals(self):
+        if self._totals is None:
+            if self._lines is not None:
+                self._totals = (
+                    sum(line.quantity for line in self._lines),
+                    sum((line.total_price for line in self._lines), Decimal('0')),
+                )
+            else:
+                totals = CartItem.objects.filter(cart__user=self.user).aggregate(
+                    items=Sum('quantity'),
+                    price=Sum(F('quantity') * F('product__price')),
+                )
+                self._totals = (totals['items'] or 0, totals['price'] or Decimal('0'))
+        return self._totals
+
+    @property
+    def total_items(self):
+        return self._compute_totals()[0]
+
+    @property
+    def total_price(self):
+        return self._compute_totals()[1]
+
+    @retry_on_locked
+    def add(self, product, quantity=1):
+        item, created = CartItem.objects.get_or_create(
+            cart=self.cart, product=product, defaults={'quantity': quantity}
+        )
+        if not created:
+            CartItem.objects.filter(pk=item.pk).update(quantity=F('quantity') + quantity)
+        self._reset()
+
+    @retry_on_locked
+    def update(self, product_id, quantity):
+        CartItem.objects.filter(cart__user=self.user, product_id=product_id).update(quantity=quantity)
+        self._reset()
+
+    @retry_on_locked
+    def remove(self, product_id):
+        CartItem.objects.filter(cart__user=self.user, product_id=product_id).delete()
+        self._reset()
+
+    @retry_on_locked
+    def clear(self):
+        CartItem.objects.filter(cart__user=self.user).delete()
+        self._reset()
+
+    def _reset(self):
+        self._lines = None
+        self._totals = None
+        cache.delete(_summary_cache_key(self.user.pk))
+
+
+def get_cart(request):
+    """Retourne le panier de la requête (mémorisé sur la requête)."""
+    if not hasattr(request, '_cart'):
+        if request.user.is_authenticated:
+            request._cart = DatabaseCart(request.user)
+        else:
+            request._cart = SessionCart(request.session)
+    return request._cart
+
+
+def merge_session_cart(session, user):
+    """
+    Fusionne le panier de session dans le panier de l'utilisateur qui se
+    connecte : une lecture des lignes existantes, puis un bulk_create et un
+    bulk_update.
+    """
+    data = session.get(SESSION_KEY)
+    if not data:
+        return
+    cart, _ = Cart.objects.get_or_create(user=user)
+    existing = {item.product_id: item for item in cart.items.all()}
+    valid_ids = set(Product.objects.filter(pk__in=[int(pid) for pid in data]).values_list('pk', flat=True))
+
+    to_create, to_update = [], []
+    for pid, (quantity, _) in data.items():
+        product_id = int(pid)
+        if product_id not in valid_ids:
+            continue
+        if product_id in existing:
+            item = existing[product_id]
+            item.quantity += quantity
+            to_update.append(item)
+        else:
+            to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+    CartItem.objects.bulk_create(to_create)
+    CartItem.objects.bulk_update(to_update, ['quantity'])
+
+    del session[SESSION_KEY]
+    session.pop(SUMMARY_SESSION_KEY, None)
+    cache.delete(_summary_cache_key(user.pk))
+
+
+def get_cart_summary(request):
+    """
+    Retourne {'count': ..., 'total': ...} pour l'en-tête et l'API JSON,
+    sans jamais charger de produit ni de ligne de panier en régime établi.
+    Mémorisé sur la requête.
+    """
+    if not hasattr(request, '_cart_summary'):
+        request._cart_summary = _cart_summary(request)
+    return request._cart_summary
+
+
+def _cart_summary(request):
+    if request.user.is_authenticated:
+        key = _summary_cache_key(request.user.pk)
+        summary = cache.get(key)
+        if summary is None:
+            cart = get_cart(request)
+            summary = (cart.total_items, cart.total_price)
+            cache.set(key, summary, SUMMARY_TIMEOUT)
+        count, total = summary
+    else:
+        summary = request.session.get(SUMMARY_SESSION_KEY)
+        if summary is None:
+            if not request.session.get(SESSION_KEY):
+                return {'count': 0, 'total': Decimal('0')}
+            # Panier enregistré avant l'existence du résumé : on le calcule une fois
+            get_cart(request).save()
+            summary = request.session[SUMMARY_SESSION_KEY]
+        count, total = summary
+    return {'count': count, 'total': Decimal(total).quantize(Decimal('0.01'))}
@@ -0,0 +1,91 @@
+"""
+GET conditionnels (ETag / Last-Modified) pour les pages du catalogue.
+
+Les validateurs sont dérivés des versions de site_cache (horodatages en ns,
+voir core/cache.py) des modèles affichés par la page : tant qu'aucun de ces
+modèles n'a changé, un navigateur ou un CDN qui revalide reçoit un
+304 Not Modified, sans exécuter la vue ni rendre le template.
+
+La partie propre au visiteur (résumé du panier de l'en-tête, utilisateur)
+entre dans l'ETag. Last-Modified n'est envoyé qu'aux visiteurs anonymes au
+panier vide : pour les autres, seul l'ETag suit leurs changements.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import site_cache
+from .cart import get_cart_summary
+
+# Modèles affichés sur toutes les pages (en-tête, pied de page)
+LAYOUT_MODELS = ('core.siteinfo', 'core.service')
+
+
+def _validators(request, models):
+    """(etag, last_modified) de la page, ou None si elle ne doit pas être validée."""
+    if not hasattr(request, '_page_validators'):
+        request._page_validators = None
+        # Des messages en attente seraient perdus par un 304
+        if not len(messages.get_messages(request)):
+            versions = site_cache.versions(*models)
+            summary = get_cart_summary(request)
+            personal = request.user.is_authenticated or summary['count']
+            key = '|'.join([
+                settings.PAGE_CACHE_REVISION,
+                *map(str, versions),
+                str(request.user.pk), str(summary['count']), str(summary['total']),
+            ])
+            last_modified = None
+            if not personal:
+                last_modified = datetime.fromtimestamp(max(versions) / 1e9, tz=timezone.utc)
+            request._page_validators = (hashlib.sha1(key.encode()).hexdigest(), last_modified)
+    return request._page_validators
+
+
+def conditional_page(*models):
+    """
+    Décorateur de vue : ETag et Last-Modified calculés à partir des versions
+    des modèles donnés (en plus de ceux du gabarit commun).
+    """
+    models = LAYOUT_MODELS + models
+
+    def etag(request, *args, **kwargs):
+        validators = _validators(request, models)
+        return validators and validators[0]
+
+    def last_modified(request, *args, **kwargs):
+        validators = _validators(request, models)
+        return validators and validators[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Session, utilisateur et panier peuvent nécessiter l'ORM synchrone
+                await sync_to_async(_validators)(request, models)
+                return _patch(await conditional_view(request, *args, **kwargs))
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return _patch(conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def _patch(response):
+    if response.has_header('ETag'):
+        # Toujours revalider ; ne pas partager une page personnalisée
+        patch_cache_control(
+            response, no_cache=True,
+            private=not response.has_header('Last-Modified'),
+        )
+    return response
@@ -1,18 +1,30 @@
-from .models import  SiteInfo, Service
-from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_site_info, get_services
+from .cart import get_cart_summary
 
 def site_info(request):
     """
     Fournit les informations globales du site à tous les templates.
+    Servi depuis le cache versionné : aucune requête en régime établi.
     """
-    site = SiteInfo.objects.first()  # On suppose un seul enregistrement
     return {
-        'site_info': site
+        'site_info': get_site_info()
     }
 
 def services_pro(request):
-    services = Service.objects.all()
+    return {
+        'services': get_services()
+    }
 
+def cart_summary(request):
+    """Nombre d'articles et total du panier pour l'en-tête (calculé à la demande)."""
     return {
-        'services':services
-    }
\ No newline at end of file
+        'cart_summary': SimpleLazyObject(lambda: get_cart_summary(request))
+    }
+
+def static_export(request):
+    """Vrai pendant le rendu des pages par `manage.py export_static` (en-tête X-Static-Export)."""
+    return {
+        'static_export': request.headers.get('X-Static-Export') == '1'
+    }
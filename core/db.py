@@ -0,0 +1,27 @@
+import functools
+import time
+
+from django.db import OperationalError, connection
+
+
+def retry_on_locked(func=None, attempts=5, delay=0.05):
+    """
+    Relance une écriture quand SQLite répond « database is locked ».
+
+    Dernier recours après le busy timeout de la connexion : utile lors des
+    pics d'écriture. Aucune relance à l'intérieur d'une transaction déjà
+    ouverte, qu'il faut annuler en entier.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, attempts=attempts, delay=delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if 'locked' not in str(exc) or attempt == attempts or connection.in_atomic_block:
+                    raise
+                time.sleep(delay * 2 ** (attempt - 1))
+    return wrapper
@@ -0,0 +1,384 @@
+"""
+Import et export en masse du catalogue (commandes import_catalogue et
+export_catalogue).
+
+Une ligne par produit, en CSV ou en JSON Lines, avec les colonnes :
+
+    slug, name, category, price, stock, is_active, is_featured, description, image, images
+
+`category` est le nom de la catégorie (créée au besoin), `image` le chemin
+de l'image principale dans le stockage (products/...) et `images` les
+chemins de la galerie dans l'ordre (séparés par « | » en CSV, liste en
+JSON). Les fichiers image voyagent dans une archive zip à part, sous ces
+mêmes chemins.
+
+Les fichiers sont lus et écrits en flux, par lots de `batch_size`
+produits : la mémoire reste bornée quel que soit la taille du catalogue.
+Un lot importé coûte quelques requêtes (lecture des produits du lot,
+bulk_create, bulk_update, index) dans une transaction courte. Aucun signal
+n'est émis : le HTML des descriptions, l'index de la boutique et les
+versions de site_cache sont tenus à jour ici, une seule fois par import.
+
+Un produit est identifié par son slug. Une ligne sans slug prend celui de
+son nom, suffixé (-2, -3...) si une ligne précédente du fichier l'a déjà
+pris ou si c'est l'ancien slug redirigé d'un produit renommé
+(slugs.allocate_many) : réimporter le même fichier met à jour les mêmes
+produits, et les lignes inchangées ne sont pas réécrites.
+"""
+import csv
+import json
+import posixpath
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import images, search, slugs
+from .cache import site_cache
+from .db import retry_on_locked
+from .models import Category, Product, ProductImage
+from .richtext import render_rich_text
+
+FIELDS = ['slug', 'name', 'category', 'price', 'stock', 'is_active', 'is_featured', 'description', 'image', 'images']
+
+# Champs réécrits par bulk_update pour un produit modifié
+UPDATE_FIELDS = [
+    'name', 'category', 'price', 'stock', 'is_active', 'is_featured',
+    'description', 'description_html', 'image', 'updated_at',
+]
+
+BATCH_SIZE = 500
+TRUE_VALUES = {'1', 'true', 'yes', 'oui', 'vrai'}
+
+
+def detect_format(path, default='jsonl'):
+    return 'csv' if str(path).lower().endswith('.csv') else default
+
+
+# ------------------------
+# LECTURE / ÉCRITURE DES LIGNES
+# ------------------------
+
+def read_rows(handle, fmt):
+    """Lignes du fichier, une à une (dictionnaires)."""
+    if fmt == 'csv':
+        for row in csv.DictReader(handle):
+            row['images'] = None if row.get('images') is None else [
+                name for name in row['images'].split('|') if name
+            ]
+            yield row
+    else:
+        for line in handle:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as exc:
+                    # Ligne illisible : rejetée par CatalogueImporter.clean(), l'import continue
+                    yield ValueError(f"JSON invalide : {exc}")
+
+
+def write_rows(handle, fmt, rows):
+    """Écrit les lignes en flux ; retourne leur nombre."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(handle, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({
+                **row, 'images': '|'.join(row['images']),
+                'is_active': int(row['is_active']), 'is_featured': int(row['is_featured']),
+            })
+            count += 1
+    else:
+        for row in rows:
+            handle.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def _bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+# ------------------------
+# EXPORT
+# ------------------------
+
+def export_rows(batch_size=BATCH_SIZE):
+    """Produits du catalogue au format d'échange, lus par lots de `batch_size`."""
+    gallery = Prefetch('images', queryset=ProductImage.objects.order_by('order', 'pk').only('product', 'image'))
+    products = Product.objects.select_related('category').prefetch_related(gallery).order_by('pk')
+    for product in products.iterator(chunk_size=batch_size):
+        yield {
+            'slug': product.slug,
+            'name': product.name,
+            'category': product.category.name,
+            'price': str(product.price),
+            'stock': product.stock,
+            'is_active': product.is_active,
+            'is_featured': product.is_featured,
+            'description': product.description,
+            'image': product.image.name,
+            'images': [image.image.name for image in product.images.all()],
+        }
+
+
+def write_image_archive(path, names, workers=4):
+    """
+    Copie les images `names` du stockage dans une archive zip. Les lectures
+    se font dans un pool de threads, par lots : au plus quelques dizaines
+    d'images en mémoire à la fois. Retourne le nombre d'images archivées.
+    """
+    def read(name):
+        try:
+            with default_storage.open(name) as source:
+                return name, source.read()
+        except OSError:
+            return name, None
+
+    names = sorted(names)
+    step = workers * 8
+    written = 0
+    # Images déjà compressées : aucune compression zip
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(names), step):
+            for name, content in pool.map(read, names[start:start + step]):
+                if content is not None:
+                    archive.writestr(name, content)
+                    written += 1
+    return written
+
+
+# ------------------------
+# IMPORT
+# ------------------------
+
+def extract_image_archive(path, workers=4):
+    """
+    Copie dans le stockage les images d'une archive zip, dans un pool de
+    threads. Un fichier déjà présent avec la même taille est laissé tel
+    quel ; un fichier remplacé voit ses déclinaisons existantes régénérées.
+    Retourne le nombre d'images écrites.
+    """
+    local = threading.local()
+    opened = []
+
+    def store(member):
+        replaced = default_storage.exists(member.filename)
+        if replaced and default_storage.size(member.filename) == member.file_size:
+            return 0
+        # Une ouverture de l'archive par thread
+        if not hasattr(local, 'archive'):
+            local.archive = zipfile.ZipFile(path)
+            opened.append(local.archive)
+        images._save(member.filename, ContentFile(local.archive.read(member)))
+        if replaced:
+            # Mêmes noms de déclinaisons : les anciennes montreraient l'ancienne image
+            images.refresh(member.filename)
+        return 1
+
+    with zipfile.ZipFile(path) as archive:
+        members = []
+        for member in archive.infolist():
+            name = posixpath.normpath(member.filename)
+            if member.is_dir():
+                continue
+            if name.startswith(('/', '..')) or name != member.filename:
+                raise ValueError(f"Chemin refusé dans l'archive : {member.filename}")
+            members.append(member)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(store, members))
+    finally:
+        for handle in opened:
+            handle.close()
+
+
+class CatalogueImporter:
+    """Importe des lignes de catalogue par lots ; voir le docstring du module."""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.categories = {category.name.casefold(): category for category in Category.objects.all()}
+        # Slugs déjà attribués à une ligne de ce fichier
+        self.seen = set()
+        self.stats = {'created': 0, 'updated': 0, 'unchanged': 0}
+        self.errors = []
+        # Images à décliner (srcset) une fois l'import terminé
+        self.new_images = {'product': set(), 'gallery': set()}
+
+    def run(self, rows):
+        batch = []
+        try:
+            for number, row in enumerate(rows, start=1):
+                try:
+                    batch.append(self.clean(row))
+                except (AttributeError, KeyError, TypeError, ValueError, InvalidOperation) as exc:
+                    self.errors.append((number, str(exc)))
+                    continue
+                if len(batch) >= self.batch_size:
+                    self.save(batch)
+                    batch = []
+            self.save(batch)
+        finally:
+            # Un seul changement de version pour tout l'import, y compris
+            # interrompu : les lots déjà validés sont visibles
+            if self.stats['created'] or self.stats['updated']:
+                site_cache.bump(Product, Category, ProductImage)
+        return self.stats
+
+    def clean(self, row):
+        if isinstance(row, ValueError):
+            # Ligne illisible signalée par read_rows()
+            raise row
+        if not isinstance(row, dict):
+            raise ValueError("la ligne doit être un objet JSON")
+        name = (row.get('name') or '').strip()
+        category = (row.get('category') or '').strip()
+        if not name or not category:
+            raise ValueError("nom et catégorie obligatoires")
+        price = Decimal(str(row['price']))
+        stock = int(row.get('stock') or 0)
+        if price < 0 or stock < 0:
+            raise ValueError("prix et stock doivent être positifs")
+
+        slug = slugify(row.get('slug') or '')
+        if slug:
+            if slug in self.seen:
+                raise ValueError(f"slug en double : {slug}")
+            self.seen.add(slug)
+
+        return {
+            # Slug vide : attribué par lot dans save()
+            'slug': slug,
+            'name': name,
+            'category': category,
+            'price': price,
+            'stock': stock,
+            'is_active': _bool(row.get('is_active'), True),
+            'is_featured': _bool(row.get('is_featured'), False),
+            'description': row.get('description') or '',
+            'image': row.get('image') or '',
+            'images': row.get('images'),
+        }
+
+    def _ensure_categories(self, names):
+        missing = {}
+        for name in names:
+            missing.setdefault(name.casefold(), name)
+        names = [name for key, name in missing.items() if key not in self.categories]
+        if names:
+            categories = [
+                Category(name=name, slug=slug)
+                for name, slug in zip(names, slugs.allocate_many(Category, names))
+            ]
+            for category in Category.objects.bulk_create(categories):
+                self.categories[category.name.casefold()] = category
+
+    def _allocate_slugs(self, batch):
+        # Une requête par lot ; les slugs des produits existants restent
+        # attribuables (mise à jour), pas les anciens slugs redirigés
+        pending = [row for row in batch if not row['slug']]
+        if pending:
+            allocated = slugs.allocate_many(
+                Product, [row['name'] for row in pending], taken=self.seen, instances=False,
+            )
+            for row, slug in zip(pending, allocated):
+                row['slug'] = slug
+
+    def save(self, batch):
+        if not batch:
+            return
+        self._allocate_slugs(batch)
+        self._ensure_categories({row['category'] for row in batch})
+        existing = Product.objects.select_related('category').in_bulk(
+            [row['slug'] for row in batch], field_name='slug',
+        )
+        galleries = {}
+        for product_id, name in ProductImage.objects.filter(
+            product__in=[product.pk for product in existing.values()]
+        ).order_by('order', 'pk').values_list('product', 'image'):
+            galleries.setdefault(product_id, []).append(name)
+
+        now = timezone.now()
+        to_create, to_update, new_galleries = [], [], {}
+        for row in batch:
+            values = {field: row[field] for field in UPDATE_FIELDS if field in row}
+            values['category'] = self.categories[row['category'].casefold()]
+            product = existing.get(row['slug'])
+            gallery = row['images']
+
+            if product is None:
+                product = Product(slug=row['slug'], **values)
+                product.description_html = render_rich_text(product.description)
+                to_create.append(product)
+                if gallery:
+                    new_galleries[row['slug']] = gallery
+                if product.image:
+                    self.new_images['product'].add(product.image.name)
+                continue
+
+            changed = [
+                field for field, value in values.items()
+                if (product.category_id != value.pk if field == 'category' else getattr(product, field) != value)
+            ]
+            gallery_changed = gallery is not None and gallery != galleries.get(product.pk, [])
+            if not changed and not gallery_changed:
+                self.stats['unchanged'] += 1
+                continue
+            for field in changed:
+                setattr(product, field, values[field])
+            if 'description' in changed:
+                product.description_html = render_rich_text(product.description)
+            if 'image' in changed and product.image:
+                self.new_images['product'].add(product.image.name)
+            product.updated_at = now
+            to_update.append(product)
+            if gallery_changed:
+                new_galleries[row['slug']] = gallery
+
+        self._write(to_create, to_update, new_galleries)
+        for gallery in new_galleries.values():
+            self.new_images['gallery'].update(gallery)
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+
+    @retry_on_locked
+    def _write(self, to_create, to_update, new_galleries):
+        with transaction.atomic():
+            Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+            Product.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=self.batch_size)
+            if new_galleries:
+                by_slug = {product.slug: product for product in to_create + to_update}
+                ProductImage.objects.filter(
+                    product__in=[by_slug[slug].pk for slug in new_galleries]
+                ).delete()
+                ProductImage.objects.bulk_create([
+                    ProductImage(product=by_slug[slug], image=name, order=order)
+                    for slug, gallery in new_galleries.items()
+                    for order, name in enumerate(gallery)
+                ], batch_size=self.batch_size)
+            search.index_products(to_create + to_update)
+
+    def generate_derivatives(self, workers=4):
+        """Déclinaisons responsives des images importées, dans un pool de threads."""
+        jobs = [
+            (name, images.FIELD_RENDITIONS[('core.product', 'image')]) for name in self.new_images['product']
+        ] + [
+            (name, images.FIELD_RENDITIONS[('core.productimage', 'image')]) for name in self.new_images['gallery']
+        ]
+        # Pillow libère le GIL pendant l'encodage : des threads suffisent
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(lambda job: images.generate(*job), jobs))
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Contact
+from .models import Contact, Order
 
 class ContactForm(forms.ModelForm):
     class Meta:
@@ -11,3 +11,13 @@ class ContactForm(forms.ModelForm):
             'subject': forms.TextInput(attrs={'class': 'border border-gray-300 rounded-lg px-3 py-2 w-full', 'placeholder': 'Sujet'}),
             'message': forms.Textarea(attrs={'class': 'border border-gray-300 rounded-lg px-3 py-2 w-full', 'placeholder': 'Votre message', 'rows': 5}),
         }
+
+
+class CheckoutForm(forms.ModelForm):
+    """Coordonnées et mode de livraison de la page de paiement (champs écrits dans le template)"""
+    class Meta:
+        model = Order
+        fields = [
+            'first_name', 'last_name', 'email', 'phone', 'address', 'address2',
+            'city', 'state', 'zip_code', 'country', 'shipping_method',
+        ]
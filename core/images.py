@@ -0,0 +1,148 @@
+"""
+Déclinaisons responsives des images (produits, galerie, slides).
+
+Pour chaque image téléversée, on génère avec Pillow des versions WebP à
+plusieurs largeurs (pour srcset) et une version JPEG de repli, rangées sous
+MEDIA_ROOT/derivatives/ avec un nom déterministe, qui garde l'extension de
+la source (products/a.png et products/a.jpg ont des déclinaisons distinctes) :
+
+    products/importe2.png  ->  derivatives/products/importe2.png-320w.webp
+                               derivatives/products/importe2.png-480w.jpg
+
+La génération a lieu à l'enregistrement (core/signals.py) ou en lot avec
+`manage.py generate_derivatives`. Le tag {% responsive_image %} de
+core/templatetags/image_tags.py émet le <picture> correspondant.
+"""
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = 'derivatives'
+
+# Largeurs générées et attribut `sizes` pour chaque usage dans les templates.
+# La version JPEG de repli utilise la largeur `fallback`.
+RENDITIONS = {
+    'thumb': {'widths': [96, 192], 'fallback': 192, 'sizes': '80px'},
+    'card': {'widths': [320, 480, 640], 'fallback': 480,
+             'sizes': '(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw'},
+    'gallery': {'widths': [480, 800, 1200], 'fallback': 800,
+                'sizes': '(min-width: 1024px) 50vw, 100vw'},
+    'hero': {'widths': [768, 1280, 1920], 'fallback': 1280, 'sizes': '100vw'},
+    'content': {'widths': [480, 800, 1200], 'fallback': 800, 'sizes': '(min-width: 768px) 768px, 100vw'},
+}
+
+# Usages de chaque champ image : (label du modèle, nom du champ) -> renditions
+FIELD_RENDITIONS = {
+    ('core.product', 'image'): ['thumb', 'card', 'gallery'],
+    ('core.productimage', 'image'): ['thumb', 'gallery'],
+    ('core.heroslide', 'image'): ['thumb', 'hero'],
+}
+
+WEBP_OPTIONS = {'format': 'WEBP', 'quality': 80, 'method': 4}
+JPEG_OPTIONS = {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}
+
+# Noms d'images dont on sait que les déclinaisons existent (évite un stat par rendu)
+_known = set()
+
+
+def derivative_name(name, width, ext):
+    """Chemin (relatif au stockage) de la déclinaison d'une image."""
+    return f"{DERIVATIVES_DIR}/{name}-{width}w.{ext}"
+
+
+def srcset(name, rendition):
+    """Valeur d'attribut srcset WebP pour une image et un usage."""
+    widths = RENDITIONS[rendition]['widths']
+    return ', '.join(
+        f"{default_storage.url(derivative_name(name, width, 'webp'))} {width}w" for width in widths
+    )
+
+
+def fallback_url(name, rendition):
+    """URL de la version JPEG de repli."""
+    width = RENDITIONS[rendition]['fallback']
+    return default_storage.url(derivative_name(name, width, 'jpg'))
+
+
+def has_derivatives(name, rendition):
+    """Indique si les déclinaisons d'une image existent (seul le succès est mémorisé)."""
+    key = (name, rendition)
+    if key in _known:
+        return True
+    width = RENDITIONS[rendition]['fallback']
+    if default_storage.exists(derivative_name(name, width, 'jpg')):
+        _known.add(key)
+        return True
+    return False
+
+
+def _encode(image, width, options):
+    copy = image.copy()
+    copy.thumbnail((width, width * 4), Image.LANCZOS)
+    if options['format'] == 'JPEG' and copy.mode != 'RGB':
+        copy = copy.convert('RGB')
+    buffer = BytesIO()
+    copy.save(buffer, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, content)
+
+
+def generate(name, renditions, force=False):
+    """
+    Génère les déclinaisons d'une image pour les usages donnés.
+    Retourne le nombre de fichiers écrits (0 si tout existait déjà).
+    """
+    todo = [r for r in renditions if force or not has_derivatives(name, r)]
+    if not todo or not name:
+        return 0
+    try:
+        with default_storage.open(name) as source:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError) as exc:
+        logger.warning("Déclinaisons impossibles pour %s : %s", name, exc)
+        return 0
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    written = 0
+    for rendition in todo:
+        spec = RENDITIONS[rendition]
+        for width in spec['widths']:
+            _save(derivative_name(name, width, 'webp'), _encode(image, width, WEBP_OPTIONS))
+            written += 1
+        # La version de repli est écrite en dernier : c'est elle que has_derivatives() teste
+        _save(derivative_name(name, spec['fallback'], 'jpg'), _encode(image, spec['fallback'], JPEG_OPTIONS))
+        written += 1
+        _known.add((name, rendition))
+    return written
+
+
+def refresh(name):
+    """
+    Régénère les déclinaisons existantes d'une image dont le fichier vient
+    d'être remplacé sous le même nom ; retourne le nombre de fichiers écrits.
+    """
+    return generate(name, [rendition for rendition in RENDITIONS if has_derivatives(name, rendition)], force=True)
+
+
+def generate_for_instance(instance, force=False):
+    """Génère les déclinaisons de tous les champs image suivis d'une instance."""
+    written = 0
+    for (label, field_name), renditions in FIELD_RENDITIONS.items():
+        if instance._meta.label_lower == label:
+            field_file = getattr(instance, field_name)
+            if field_file:
+                written += generate(field_file.name, renditions, force=force)
+    return written
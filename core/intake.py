@@ -0,0 +1,148 @@
+"""
+Réception des messages de contact.
+
+La vue (asynchrone) valide le formulaire, applique un plafond d'envois par
+adresse IP, puis enregistre le message (un seul INSERT) avant de répondre :
+un message annoncé comme envoyé est toujours en base. Seule la
+notification des ADMINS est différée : un thread du process vide une file
+en mémoire par lots et envoie un seul e-mail résumant chaque lot. Un arrêt
+brutal du process peut faire perdre des notifications, jamais des messages
+(ils restent lisibles dans l'admin).
+
+Le plafond ne compte que les envois valides. Il est tenu dans le cache
+'ratelimit', partagé entre les process, et porte sur l'adresse réelle du
+client (client_ip()), y compris derrière un proxy inverse.
+
+CONTACT_INTAKE_EAGER = True notifie immédiatement, dans l'appelant (tests,
+commandes).
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.mail import mail_admins
+
+from .db import retry_on_locked
+
+logger = logging.getLogger(__name__)
+
+RATE_CACHE_ALIAS = 'ratelimit'
+
+_queue = queue.Queue(maxsize=10000)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def client_ip(request):
+    """
+    Adresse du client. Derrière TRUSTED_PROXY_COUNT proxys inverses, c'est
+    l'entrée de X-Forwarded-For ajoutée par le plus éloigné d'entre eux : les
+    entrées situées plus à gauche viennent du client et peuvent être forgées.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [part for part in forwarded if part]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _rate_key(ip):
+    return f"contact_rate:{ip}"
+
+
+async def allow_submission(ip):
+    """Compte un envoi pour cette IP ; False au-delà de CONTACT_RATE_LIMIT par fenêtre."""
+    limit, window = settings.CONTACT_RATE_LIMIT
+    cache = caches[RATE_CACHE_ALIAS]
+    key = _rate_key(ip)
+    await cache.aadd(key, 0, window)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        # Clé expirée entre add et incr : nouvelle fenêtre
+        await cache.aset(key, 1, window)
+        count = 1
+    return count <= limit
+
+
+@retry_on_locked
+def _save(contact):
+    # post_save invalide le cache versionné des messages
+    contact.save()
+
+
+def _notify(contacts):
+    lines = [
+        f"- {contact.name} <{contact.email}> : {contact.subject}\n  {contact.message[:500]}"
+        for contact in contacts
+    ]
+    mail_admins(
+        f"{len(contacts)} nouveau(x) message(s) de contact",
+        "\n\n".join(lines),
+        fail_silently=True,
+    )
+
+
+def _drain():
+    """Retire un lot de la file : attend le premier message, puis au plus CONTACT_BATCH_SIZE."""
+    batch = []
+    try:
+        batch.append(_queue.get())
+        while len(batch) < settings.CONTACT_BATCH_SIZE:
+            batch.append(_queue.get(timeout=settings.CONTACT_FLUSH_INTERVAL))
+    except queue.Empty:
+        pass
+    return batch
+
+
+def _run():
+    while True:
+        batch = _drain()
+        try:
+            _notify(batch)
+        except Exception:
+            logger.exception("Échec de la notification de %d message(s) de contact", len(batch))
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='contact-intake', daemon=True)
+            _worker.start()
+
+
+async def submit(contact):
+    """Enregistre un Contact validé, puis met sa notification en file (ou l'envoie en mode immédiat)."""
+    await sync_to_async(_save)(contact)
+    if settings.CONTACT_INTAKE_EAGER:
+        await sync_to_async(_notify)([contact])
+        return
+    try:
+        _queue.put_nowait(contact)
+    except queue.Full:
+        await sync_to_async(_notify)([contact])
+        return
+    _ensure_worker()
+
+
+@atexit.register
+def flush():
+    """Envoie les notifications encore en file (arrêt du process)."""
+    batch = []
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _notify(batch)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/', '/shop/', '/shop/?page=2', '/shop/?q=bois']
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit des vues du catalogue sous WSGI (vues synchrones, pool de threads) "
+        "et sous ASGI (vues asynchrones, boucle d'événements), sur la même base, à forte concurrence. "
+        "Les applications sont appelées en process, sans réseau : seul le coût de Django est mesuré."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+        parser.add_argument('--concurrency', type=int, default=50, help="Requêtes simultanées")
+        parser.add_argument('--requests', type=int, default=1000, help="Nombre total de requêtes par mode")
+        parser.add_argument('--path', action='append', dest='paths', help="URL à appeler (répétable)")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON (utilisée entre process)")
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        if options['mode'] == 'both':
+            results = [self.run_child(mode, options, paths) for mode in ('wsgi', 'asgi')]
+            self.report(results)
+            return
+
+        urls = [paths[i % len(paths)] for i in range(options['requests'])]
+        run = self.run_wsgi if options['mode'] == 'wsgi' else self.run_asgi
+        # Échauffement : caches de site_cache, fragments, connexions
+        run(paths * 2, options['concurrency'])
+        elapsed, timings, statuses = run(urls, options['concurrency'])
+        result = {
+            'mode': options['mode'],
+            'requests': len(urls),
+            'concurrency': options['concurrency'],
+            'rps': len(urls) / elapsed,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'statuses': statuses,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result))
+        else:
+            self.report([result])
+
+    def run_child(self, mode, options, paths):
+        """Chaque mode tourne dans son propre process : les URL choisissent leurs vues à l'import."""
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_views', '--mode', mode, '--json',
+            '--concurrency', str(options['concurrency']), '--requests', str(options['requests']),
+        ]
+        for path in paths:
+            command += ['--path', path]
+        env = dict(os.environ, HERBAL_ASYNC_VIEWS='1' if mode == 'asgi' else '0')
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"Échec du mode {mode} :\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def run_wsgi(self, urls, concurrency):
+        from django.core.wsgi import get_wsgi_application
+
+        application = get_wsgi_application()
+
+        def call(url):
+            parts = urlsplit(url)
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': parts.path, 'QUERY_STRING': parts.query,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            status = []
+            start = time.perf_counter()
+            response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return time.perf_counter() - start, status[0].split()[0]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(call, urls))
+        return self.summarize(time.perf_counter() - start, results)
+
+    def run_asgi(self, urls, concurrency):
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+
+        async def call(url, semaphore):
+            parts = urlsplit(url)
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': parts.path,
+                'raw_path': parts.path.encode(), 'query_string': parts.query.encode(),
+                'root_path': '', 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            }
+            disconnect = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            status = []
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(str(message['status']))
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                elapsed = time.perf_counter() - start
+            disconnect.set()
+            return elapsed, status[0]
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(call(url, semaphore) for url in urls))
+            return time.perf_counter() - start, results
+
+        elapsed, results = asyncio.run(main())
+        return self.summarize(elapsed, results)
+
+    def summarize(self, elapsed, results):
+        statuses = {}
+        for _, status in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        return elapsed, [timing for timing, _ in results], statuses
+
+    def report(self, results):
+        self.stdout.write(f"{'mode':<6} {'requêtes':>9} {'concurrence':>12} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}  statuts")
+        for r in results:
+            self.stdout.write(
+                f"{r['mode']:<6} {r['requests']:>9} {r['concurrency']:>12} {r['rps']:>9.1f} "
+                f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f}  {r['statuses']}"
+            )
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core import feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte le catalogue en CSV ou JSON Lines (voir core/feeds.py), en flux, "
+        "avec en option une archive zip des images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier de sortie (.csv ou .jsonl), « - » pour la sortie standard")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Format (déduit de l'extension par défaut)")
+        parser.add_argument('--images', help="Archive zip à écrire avec les images des produits")
+        parser.add_argument('--batch-size', type=int, default=feeds.BATCH_SIZE, help="Produits lus par lot")
+        parser.add_argument('--workers', type=int, default=4, help="Threads de lecture des images")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or feeds.detect_format(path)
+
+        names = set()
+
+        def rows():
+            for row in feeds.export_rows(batch_size=options['batch_size']):
+                if options['images']:
+                    names.update(filter(None, [row['image'], *row['images']]))
+                yield row
+
+        if path == '-':
+            count = feeds.write_rows(sys.stdout, fmt, rows())
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as handle:
+                count = feeds.write_rows(handle, fmt, rows())
+
+        message = f"{count} produit(s) exporté(s)"
+        if options['images']:
+            archived = feeds.write_image_archive(options['images'], names, workers=options['workers'])
+            message += f", {archived} image(s) archivée(s)"
+        # Sur la sortie d'erreur : la sortie standard peut porter l'export lui-même
+        self.stderr.write(self.style.SUCCESS(message + "."))
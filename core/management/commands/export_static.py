@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count, Max
+from django.urls import reverse
+
+from core.models import Category, HeroSlide, Product, ProductIndex, Service, SiteInfo
+from core.views import similar_querysets
+
+MANIFEST_NAME = '.export_manifest.json'
+
+
+def page_file(root, url):
+    """Fichier d'une URL exportée : /shop/page/2/ -> <root>/shop/page/2/index.html."""
+    return Path(root, url.strip('/'), 'index.html')
+
+
+def fingerprint(*parts):
+    return hashlib.sha1('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def table_digest(model):
+    """Empreinte du contenu complet d'une petite table."""
+    return fingerprint(*model.objects.order_by('pk').values_list())
+
+
+def render_pages(root, host, urls):
+    """
+    Rend un lot d'URL avec le client de test (middlewares et context
+    processors compris) et écrit chaque page. Exécuté dans un process du pool.
+
+    L'en-tête X-Static-Export fait rendre les formulaires POST sans jeton
+    CSRF : un jeton figé dans un fichier ne correspondrait au cookie d'aucun
+    visiteur. Le jeton est demandé à /csrf/ au moment de l'envoi.
+    """
+    from django.test import Client
+
+    # Une page en erreur est signalée (statut HTTP) sans interrompre le lot
+    client = Client(HTTP_HOST=host, HTTP_X_STATIC_EXPORT='1', raise_request_exception=False)
+    results = []
+    for url in urls:
+        response = client.get(url)
+        if response.status_code == 200:
+            path = page_file(root, url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(response.content)
+            os.replace(tmp_path, path)
+        results.append((url, response.status_code))
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte les pages publiques du catalogue (accueil, à propos, boutique paginée, fiches produit) "
+        "en fichiers HTML statiques, rendus dans un pool de process. Seules les pages dont les données "
+        "ont changé depuis le dernier export sont rendues à nouveau."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(Path(settings.BASE_DIR, 'var', 'static_site')),
+                            help="Dossier de sortie")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Nombre de process")
+        parser.add_argument('--host', default='localhost', help="Hôte utilisé pour les requêtes de rendu")
+        parser.add_argument('--force', action='store_true', help="Rend toutes les pages")
+
+    def handle(self, *args, **options):
+        root = Path(options['output'])
+        root.mkdir(parents=True, exist_ok=True)
+        manifest_path = root / MANIFEST_NAME
+        manifest = {} if options['force'] else self.load_manifest(manifest_path)
+
+        pages = self.collect_pages()
+        todo = [
+            url for url, etag in pages.items()
+            if manifest.get(url) != etag or not page_file(root, url).exists()
+        ]
+        removed = [url for url in manifest if url not in pages]
+        self.stdout.write(f"{len(pages)} page(s), {len(todo)} à rendre, {len(removed)} à supprimer.")
+
+        failed = []
+        if todo:
+            # Les process du pool ne doivent pas hériter des connexions à la base
+            connections.close_all()
+            workers = max(1, min(options['workers'], len(todo)))
+            size = ceil(len(todo) / (workers * 4))
+            batches = [todo[i:i + size] for i in range(0, len(todo), size)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                futures = [pool.submit(render_pages, str(root), options['host'], batch) for batch in batches]
+                for future in futures:
+                    for url, status in future.result():
+                        if status == 200:
+                            manifest[url] = pages[url]
+                        else:
+                            failed.append(url)
+                            self.stderr.write(f"  {url} : HTTP {status}")
+
+        for url in removed:
+            page_file(root, url).unlink(missing_ok=True)
+            manifest.pop(url, None)
+
+        tmp_path = manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'exported_at': time.time(), 'pages': manifest}, indent=1))
+        os.replace(tmp_path, manifest_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(todo) - len(failed)} page(s) rendue(s), {len(removed)} supprimée(s) dans {root}."
+        ))
+
+    def collect_pages(self):
+        """
+        Toutes les URL exportables et l'empreinte des données dont chacune
+        dépend. Les empreintes sont lues en base (et non dans site_cache, dont
+        les versions en mémoire locale ne survivent pas au process) :
+        - petites tables (site, services, slides, catégories) : leur contenu ;
+        - catalogue : nombre de produits et dernière modification ;
+        - fiche : date de modification du produit et de ses produits similaires.
+        """
+        layout = (settings.PAGE_CACHE_REVISION, table_digest(SiteInfo), table_digest(Service))
+        categories = table_digest(Category)
+        catalogue = Product.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+
+        pages = {
+            reverse('home'): fingerprint(*layout, categories, catalogue, table_digest(HeroSlide)),
+            reverse('about'): fingerprint(*layout),
+        }
+
+        # Boutique : liste non filtrée, paginée par chemin
+        count = ProductIndex.objects.filter(is_active=True).count()
+        for number in range(1, max(1, ceil(count / settings.SHOP_PAGE_SIZE)) + 1):
+            url = reverse('shop') if number == 1 else reverse('shop_page', args=[number])
+            pages[url] = fingerprint(*layout, categories, catalogue, number)
+
+        products = Product.objects.filter(is_active=True).only('slug', 'category', 'created_at', 'updated_at')
+        for product in products.iterator(chunk_size=500):
+            older, newer = similar_querysets(product)
+            similar = list(older.values_list('pk', 'updated_at')[:4])
+            if len(similar) < 4:
+                similar += newer.values_list('pk', 'updated_at')[:4 - len(similar)]
+            pages[reverse('product_detail', args=[product.slug])] = fingerprint(
+                *layout, categories, product.updated_at, similar,
+            )
+        return pages
+
+    def load_manifest(self, path):
+        try:
+            return json.loads(path.read_text())['pages']
+        except (OSError, ValueError, KeyError):
+            return {}
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.cache import site_cache
+
+
+class Command(BaseCommand):
+    help = "Génère les déclinaisons responsives (WebP + JPEG) des images produits, galerie et slides."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Régénère même les déclinaisons existantes")
+        parser.add_argument('--workers', type=int, default=4, help="Nombre de threads d'encodage")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for (label, field_name), renditions in images.FIELD_RENDITIONS.items():
+            model = apps.get_model(label)
+            names = model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True).distinct()
+            jobs.extend((name, renditions) for name in names.iterator())
+
+        # Pillow libère le GIL pendant l'encodage : des threads suffisent
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            written = sum(pool.map(lambda job: images.generate(*job, force=options['force']), jobs))
+
+        # Les fragments en cache doivent maintenant pointer vers les déclinaisons
+        site_cache.bump(*(label for label, _ in images.FIELD_RENDITIONS))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs)} image(s) traitée(s), {written} déclinaison(s) écrite(s)."
+        ))
@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import feeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe ou synchronise des produits depuis un fichier CSV ou JSON Lines (voir core/feeds.py), "
+        "par lots, avec en option une archive zip des images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer (.csv ou .jsonl), « - » pour l'entrée standard")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Format (déduit de l'extension par défaut)")
+        parser.add_argument('--images', help="Archive zip des images, extraite dans le stockage avant l'import")
+        parser.add_argument('--batch-size', type=int, default=feeds.BATCH_SIZE, help="Produits écrits par lot")
+        parser.add_argument('--workers', type=int, default=4, help="Threads pour les images")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or feeds.detect_format(path)
+
+        if options['images']:
+            try:
+                written = feeds.extract_image_archive(options['images'], workers=options['workers'])
+            except (OSError, ValueError) as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(f"{written} image(s) copiée(s) dans le stockage.")
+
+        importer = feeds.CatalogueImporter(batch_size=options['batch_size'])
+        try:
+            if path == '-':
+                stats = importer.run(feeds.read_rows(sys.stdin, fmt))
+            else:
+                with open(path, newline='', encoding='utf-8') as handle:
+                    stats = importer.run(feeds.read_rows(handle, fmt))
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for number, message in importer.errors[:20]:
+            self.stderr.write(f"  ligne {number} : {message}")
+        if len(importer.errors) > 20:
+            self.stderr.write(f"  ... et {len(importer.errors) - 20} autre(s) erreur(s)")
+
+        derivatives = importer.generate_derivatives(workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} créé(s), {stats['updated']} mis à jour, {stats['unchanged']} inchangé(s), "
+            f"{len(importer.errors)} ligne(s) rejetée(s), {derivatives} déclinaison(s) écrite(s)."
+        ))
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, models
+
+from core import images
+from core.cache import site_cache
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.avif'}
+MANIFEST_NAME = '.optimize_manifest.json'
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85, 'method': 6},
+    'AVIF': {'quality': 70},
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def reencode(path):
+    """
+    Ré-encode une image dans son format d'origine, sans métadonnées EXIF :
+    l'orientation EXIF est d'abord appliquée aux pixels. Le fichier n'est
+    remplacé que si le résultat est plus léger.
+    Exécuté dans un process du pool : n'utilise que Pillow et le système de fichiers.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    before = os.path.getsize(path)
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            options = dict(SAVE_OPTIONS.get(image_format, {}))
+            if image.info.get('icc_profile'):
+                options['icc_profile'] = image.info['icc_profile']
+            # Photos d'appareil : sans l'EXIF, seule la rotation des pixels subsiste
+            image = ImageOps.exif_transpose(image)
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            tmp_path = f"{path}.tmp"
+            image.save(tmp_path, format=image_format, **options)
+    except (OSError, UnidentifiedImageError, KeyError, ValueError) as exc:
+        return path, before, before, file_hash(path), str(exc)
+
+    after = os.path.getsize(tmp_path)
+    if after < before:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+        after = before
+    return path, before, after, file_hash(path), None
+
+
+def file_fields():
+    """Tous les champs fichier/image des modèles de l'app core."""
+    for model in apps.get_app_config('core').get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+class Command(BaseCommand):
+    help = (
+        "Ré-encode les images de MEDIA_ROOT (sans métadonnées) dans un pool de process, "
+        "fusionne les doublons et met à jour les ImageField. Les images de l'éditeur "
+        "(CKEDITOR_UPLOAD_PATH), référencées depuis le HTML des descriptions, ne sont jamais "
+        "fusionnées. Reprend là où il s'était arrêté."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Nombre de process")
+        parser.add_argument('--limit', type=int, default=None, help="Nombre maximum d'images ré-encodées pour ce passage")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les doublons sans rien modifier")
+        parser.add_argument('--reset', action='store_true', help="Ignore le manifeste et retraite tout")
+
+    def handle(self, *args, **options):
+        self.root = Path(settings.MEDIA_ROOT)
+        self.manifest_path = self.root / MANIFEST_NAME
+        manifest = {} if options['reset'] else self.load_manifest()
+
+        files = self.collect()
+        merged = self.deduplicate(files, manifest, options['dry_run'])
+        if options['dry_run']:
+            return
+        for name in merged:
+            files.pop(name, None)
+            manifest.pop(name, None)
+
+        # Reprise : on saute les fichiers inchangés depuis le dernier passage
+        todo = [
+            name for name, path in sorted(files.items())
+            if manifest.get(name, {}).get('mtime') != path.stat().st_mtime_ns
+        ]
+        if options['limit'] is not None:
+            todo = todo[:options['limit']]
+        self.stdout.write(f"{len(files)} image(s), {len(todo)} à ré-encoder.")
+
+        saved = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(reencode, str(files[name])): name for name in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                _, before, after, digest, error = future.result()
+                if error:
+                    self.stderr.write(f"  {name} ignoré : {error}")
+                saved += before - after
+                manifest[name] = {
+                    'mtime': files[name].stat().st_mtime_ns,
+                    'sha256': digest,
+                    'before': before,
+                    'after': after,
+                }
+                # Manifeste écrit régulièrement : un passage interrompu reprend ici
+                if done % 50 == 0:
+                    self.save_manifest(manifest)
+                    self.stdout.write(f"  {done}/{len(todo)}")
+        self.save_manifest(manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(todo)} image(s) ré-encodée(s), {len(merged)} doublon(s) fusionné(s), "
+            f"{saved / 1024:.0f} Ko gagnés."
+        ))
+
+    def collect(self):
+        """Images originales de MEDIA_ROOT, hors déclinaisons : {nom relatif: Path}."""
+        files = {}
+        for path in self.root.rglob('*'):
+            name = path.relative_to(self.root).as_posix()
+            if (
+                path.is_file()
+                and path.suffix.lower() in IMAGE_EXTENSIONS
+                and not name.startswith(f"{images.DERIVATIVES_DIR}/")
+            ):
+                files[name] = path
+        return files
+
+    def deduplicate(self, files, manifest, dry_run):
+        """
+        Regroupe les fichiers identiques (SHA-256), garde le nom le plus court
+        (l'original, sans suffixe aléatoire de Django), repointe les ImageField
+        vers lui et supprime les copies. Retourne les noms supprimés.
+
+        Les images de l'éditeur sont exclues : seules les FileField sont
+        repointées, une copie citée dans le HTML d'une description serait perdue.
+        """
+        # Le hash d'un fichier inchangé depuis le dernier passage est repris du manifeste
+        by_hash = {}
+        for name, path in files.items():
+            if name.startswith(settings.CKEDITOR_UPLOAD_PATH):
+                continue
+            entry = manifest.get(name, {})
+            if entry.get('mtime') == path.stat().st_mtime_ns and entry.get('sha256'):
+                digest = entry['sha256']
+            else:
+                digest = file_hash(path)
+            by_hash.setdefault(digest, []).append(name)
+
+        merged = []
+        fields = list(file_fields())
+        for names in by_hash.values():
+            if len(names) < 2:
+                continue
+            keep, *duplicates = sorted(names, key=lambda n: (len(n), n))
+            for duplicate in duplicates:
+                self.stdout.write(f"  doublon : {duplicate} -> {keep}")
+                if dry_run:
+                    continue
+                for model, field_name in fields:
+                    model.objects.filter(**{field_name: duplicate}).update(**{field_name: keep})
+                files[duplicate].unlink()
+                merged.append(duplicate)
+
+        if merged:
+            # update() n'émet pas de signal : on invalide le cache nous-mêmes
+            site_cache.bump(*(model for model, _ in fields))
+        # Les process du pool ne doivent pas hériter des connexions à la base
+        connections.close_all()
+        return merged
+
+    def load_manifest(self):
+        try:
+            return json.loads(self.manifest_path.read_text())['files']
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def save_manifest(self, manifest):
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({'updated_at': time.time(), 'files': manifest}, indent=1))
+        os.replace(tmp_path, self.manifest_path)
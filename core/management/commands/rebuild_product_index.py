@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche et de facettes de la boutique (ProductIndex)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Nombre de produits indexés par lot")
+
+    def handle(self, *args, **options):
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{total} produit(s) indexé(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire les commandes non payées dont la réservation est échue et rend leur stock. "
+        "À lancer périodiquement (cron, toutes les minutes par exemple)."
+    )
+
+    def handle(self, *args, **options):
+        count = orders.release_expired()
+        self.stdout.write(self.style.SUCCESS(f"{count} commande(s) expirée(s), stock rendu."))
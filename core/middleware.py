@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.utils.deprecation import MiddlewareMixin
+
+REFRESH_KEY = '_refreshed_at'
+
+
+class SessionRefreshMiddleware(MiddlewareMixin):
+    """
+    Expiration glissante des sessions sans réécriture à chaque requête.
+
+    Remplace SESSION_SAVE_EVERY_REQUEST : une session existante n'est
+    réenregistrée (et son expiration repoussée) que si son dernier
+    enregistrement date de plus de SESSION_REFRESH_INTERVAL secondes.
+    La navigation en lecture seule n'écrit donc rien en base.
+
+    À placer juste après SessionMiddleware.
+    """
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        # Session vide (jamais créée, ou vidée à la déconnexion) : rien à tenir à jour
+        if session is None or session.is_empty():
+            return response
+        now = int(time.time())
+        if session.modified:
+            # La session est enregistrée de toute façon (création comprise) : on note l'instant
+            session[REFRESH_KEY] = now
+        elif now - session.get(REFRESH_KEY, 0) >= settings.SESSION_REFRESH_INTERVAL:
+            session[REFRESH_KEY] = now
+        return response
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from bisect import bisect_right
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+FTS_STATEMENTS = [
+    "CREATE VIRTUAL TABLE core_productsearch USING fts5("
+    "search_text, content='core_productindex', content_rowid='product_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER core_productindex_ai AFTER INSERT ON core_productindex BEGIN "
+    "INSERT INTO core_productsearch(rowid, search_text) VALUES (new.product_id, new.search_text); END",
+    "CREATE TRIGGER core_productindex_ad AFTER DELETE ON core_productindex BEGIN "
+    "INSERT INTO core_productsearch(core_productsearch, rowid, search_text) "
+    "VALUES ('delete', old.product_id, old.search_text); END",
+    "CREATE TRIGGER core_productindex_au AFTER UPDATE ON core_productindex BEGIN "
+    "INSERT INTO core_productsearch(core_productsearch, rowid, search_text) "
+    "VALUES ('delete', old.product_id, old.search_text); "
+    "INSERT INTO core_productsearch(rowid, search_text) VALUES (new.product_id, new.search_text); END",
+]
+
+
+def create_fts(apps, schema_editor):
+    """Table FTS5 synchronisée par triggers (SQLite uniquement)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in ('core_productindex_ai', 'core_productindex_ad', 'core_productindex_au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute("DROP TABLE IF EXISTS core_productsearch")
+
+
+def populate_index(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    ProductIndex = apps.get_model('core', 'ProductIndex')
+    ProductIndex.objects.bulk_create([
+        ProductIndex(
+            product_id=product.pk,
+            category_slug=product.category.slug,
+            price=product.price,
+            price_bucket=bisect_right(settings.SHOP_PRICE_BUCKETS, product.price),
+            is_active=product.is_active,
+            in_stock=product.stock > 0,
+            created_at=product.created_at,
+            search_text=f"{product.name} {strip_tags(product.description)}",
+        )
+        for product in Product.objects.select_related('category').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_product_image_productimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductIndex',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_entry', serialize=False, to='core.product')),
+                ('category_slug', models.SlugField(max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_bucket', models.PositiveSmallIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('search_text', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Index produit',
+                'verbose_name_plural': 'Index produits',
+                'indexes': [models.Index(fields=['is_active', 'category_slug', 'price_bucket'], name='productindex_facets_idx'), models.Index(fields=['is_active', 'category_slug', 'created_at'], name='productindex_category_idx'), models.Index(fields=['is_active', 'created_at'], name='productindex_recent_idx'), models.Index(fields=['is_active', 'price'], name='productindex_price_idx')],
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
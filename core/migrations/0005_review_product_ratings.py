@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_productindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3, verbose_name='Note moyenne'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre d'avis"),
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nom')),
+                ('rating', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)], verbose_name='Note')),
+                ('comment', models.TextField(blank=True, verbose_name='Commentaire')),
+                ('is_approved', models.BooleanField(default=False, verbose_name='Approuvé')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Avis',
+                'verbose_name_plural': 'Avis',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'is_approved', 'created_at'], name='review_product_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_cart'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productindex',
+            name='productindex_facets_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productindex',
+            name='productindex_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productindex',
+            name='productindex_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productindex',
+            name='productindex_price_idx',
+        ),
+        migrations.AddIndex(
+            model_name='heroslide',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order'], name='heroslide_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_featured', True)), fields=['-created_at'], name='product_featured_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at'], name='product_category_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productindex',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category_slug', 'price_bucket'], name='productindex_facets_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productindex',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category_slug', 'created_at'], name='productindex_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productindex',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at'], name='productindex_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productindex',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price'], name='productindex_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['order'], name='service_active_order_idx'),
+        ),
+    ]
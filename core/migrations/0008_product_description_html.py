@@ -0,0 +1,152 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:23
+
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+
+# Copie figée du nettoyage de core/richtext.py à la date de la migration : les
+# évolutions du module ne changent pas ce que fait cette migration, qui n'écrit
+# aucun fichier. Les déclinaisons des images de l'éditeur (srcset) sont
+# ajoutées au prochain enregistrement de chaque produit.
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure',
+    'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span',
+    'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Balises supprimées avec tout leur contenu
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'svg', 'math'}
+
+ALLOWED_ATTRS = {
+    '*': {'style', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'},
+}
+URL_ATTRS = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+
+def _safe_url(value):
+    # Les navigateurs ignorent les caractères de contrôle et espaces dans le schéma
+    cleaned = ''.join(ch for ch in value if ch > ' ').strip()
+    try:
+        return urlsplit(cleaned).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+def _safe_style(value):
+    lowered = value.lower()
+    return not any(token in lowered for token in ('url(', 'expression', 'javascript:', '@import'))
+
+
+class _Sanitizer(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRS['*'] | ALLOWED_ATTRS.get(tag, set())
+        clean = {}
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            if name == 'style' and not _safe_style(value):
+                continue
+            clean[name] = value
+        if tag == 'img':
+            if 'src' not in clean:
+                return
+            clean['loading'] = 'lazy'
+            clean['decoding'] = 'async'
+        elif tag == 'a' and clean.get('target') == '_blank':
+            clean['rel'] = 'noopener noreferrer'
+        self._emit_tag(tag, clean)
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            # <svg/> : aucun contenu à écarter, aucune fermeture à attendre
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Ferme aussi les balises laissées ouvertes à l'intérieur
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.out.append(f'</{current}>')
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def _emit_tag(self, tag, attrs):
+        rendered = ''.join(f' {name}="{escape(value)}"' for name, value in attrs.items())
+        self.out.append(f'<{tag}{rendered}>')
+
+    def result(self):
+        self.close()
+        return ''.join(self.out) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def render_rich_text(html):
+    if not html:
+        return ''
+    parser = _Sanitizer()
+    parser.feed(html)
+    return parser.result()
+
+
+def render_descriptions(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    batch = []
+    for product in Product.objects.only('description').iterator(chunk_size=500):
+        product.description_html = render_rich_text(product.description)
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ['description_html'])
+            batch = []
+    Product.objects.bulk_update(batch, ['description_html'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_descriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:33
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_product_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('first_name', models.CharField(max_length=100, verbose_name='Prénom')),
+                ('last_name', models.CharField(max_length=100, verbose_name='Nom')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('phone', models.CharField(blank=True, max_length=20, verbose_name='Téléphone')),
+                ('address', models.CharField(max_length=255, verbose_name='Adresse')),
+                ('address2', models.CharField(blank=True, max_length=255, verbose_name="Complément d'adresse")),
+                ('city', models.CharField(max_length=100, verbose_name='Ville')),
+                ('state', models.CharField(blank=True, max_length=100, verbose_name='Région')),
+                ('zip_code', models.CharField(max_length=20, verbose_name='Code postal')),
+                ('country', models.CharField(max_length=2, verbose_name='Pays')),
+                ('shipping_method', models.CharField(choices=[('standard', 'Standard (5-7 jours)'), ('express', 'Express (2-3 jours)'), ('overnight', 'Lendemain (1 jour)')], default='standard', max_length=20, verbose_name='Livraison')),
+                ('shipping_cost', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Frais de livraison')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Sous-total')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total')),
+                ('status', models.CharField(choices=[('pending', 'En attente de paiement'), ('paid', 'Payée'), ('expired', 'Expirée'), ('cancelled', 'Annulée')], default='pending', max_length=20, verbose_name='Statut')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name="Réservation jusqu'au")),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Commande',
+                'verbose_name_plural': 'Commandes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Produit')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Prix unitaire')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantité')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.order')),
+                ('product', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Ligne de commande',
+                'verbose_name_plural': 'Lignes de commande',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Réservation de stock',
+                'verbose_name_plural': 'Réservations de stock',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['expires_at'], name='order_pending_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_slug', models.SlugField(max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_redirects', to='core.product')),
+            ],
+            options={
+                'verbose_name': 'Redirection de slug',
+                'verbose_name_plural': 'Redirections de slug',
+            },
+        ),
+    ]
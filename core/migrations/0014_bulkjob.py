@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_similar_products_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('label', models.CharField(max_length=200, verbose_name='Action')),
+                ('total', models.PositiveIntegerField(verbose_name='Lignes')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='Lignes traitées')),
+                ('state', models.CharField(choices=[('running', 'En cours'), ('done', 'Terminée'), ('failed', 'Échouée')], default='running', max_length=20, verbose_name='État')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Démarrée le')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernier avancement')),
+            ],
+            options={
+                'verbose_name': 'Action de masse',
+                'verbose_name_plural': 'Actions de masse',
+            },
+        ),
+    ]
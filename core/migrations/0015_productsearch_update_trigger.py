@@ -0,0 +1,35 @@
+from django.db import migrations
+
+UPDATE_TRIGGER = (
+    "CREATE TRIGGER core_productindex_au AFTER UPDATE{columns} ON core_productindex BEGIN "
+    "INSERT INTO core_productsearch(core_productsearch, rowid, search_text) "
+    "VALUES ('delete', old.product_id, old.search_text); "
+    "INSERT INTO core_productsearch(rowid, search_text) VALUES (new.product_id, new.search_text); END"
+)
+
+
+def _replace_trigger(schema_editor, columns):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS core_productindex_au")
+    schema_editor.execute(UPDATE_TRIGGER.format(columns=columns))
+
+
+def limit_to_search_text(apps, schema_editor):
+    """La table FTS n'est réécrite que si le texte change (pas pour le prix, l'état, le stock)."""
+    _replace_trigger(schema_editor, ' OF search_text')
+
+
+def any_column(apps, schema_editor):
+    _replace_trigger(schema_editor, '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_bulkjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(limit_to_search_text, any_column),
+    ]
@@ -1,9 +1,19 @@
+import uuid
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.urls import reverse
-from django.utils.text import slugify
+from django.utils import timezone
 from ckeditor.fields import RichTextField
 
+from . import slugs
+from .richtext import render_rich_text
+
+# Condition des index partiels sur les lignes actives
+ACTIVE = models.Q(is_active=True)
+
 
 # ------------------------
 # E-COMMERCE
@@ -22,18 +32,59 @@ class Category(models.Model):
         ordering = ['name']
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        slugs.save_unique(self, super().save, self.name, *args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
+# Champs affichés par les cartes produit (boutique, accueil, produits similaires)
+LISTING_FIELDS = (
+    'name', 'slug', 'price', 'image', 'stock', 'is_active', 'is_featured',
+    'rating_avg', 'rating_count', 'created_at', 'category',
+    'category__name', 'category__slug',
+)
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def for_listing(self):
+        """
+        Projection des listes : seuls les champs des cartes, avec la catégorie.
+        La description (texte riche, potentiellement volumineuse) n'est jamais lue.
+        """
+        return self.select_related('category').only(*LISTING_FIELDS)
+
+    def with_ratings(self):
+        """
+        Annote review_avg / review_count calculés depuis les avis approuvés,
+        pour tous les produits du queryset en une seule requête.
+        """
+        approved = models.Q(reviews__is_approved=True)
+        return self.annotate(
+            review_avg=models.Avg('reviews__rating', filter=approved),
+            review_count=models.Count('reviews', filter=approved),
+        )
+
+    def refresh_ratings(self):
+        """Recalcule les colonnes rating_avg / rating_count des produits du queryset."""
+        products = list(self.with_ratings().only('pk'))
+        now = timezone.now()
+        for product in products:
+            product.rating_avg = Decimal(product.review_avg or 0).quantize(Decimal('0.01'))
+            product.rating_count = product.review_count
+            product.updated_at = now
+        # bulk_update ne met pas à jour les champs auto_now : updated_at est fixé ici
+        Product.objects.bulk_update(products, ['rating_avg', 'rating_count', 'updated_at'], batch_size=500)
+        return len(products)
+
+
 class Product(models.Model):
     """Produit"""
     name = models.CharField(max_length=200, verbose_name="Nom")
     description = RichTextField(verbose_name="Description")
+    # HTML nettoyé et optimisé de la description, recalculé à l'enregistrement (core/richtext.py)
+    description_html = models.TextField(blank=True, editable=False)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix")
     image = models.ImageField(upload_to='products/', verbose_name="Image principale")  # image principale
@@ -41,17 +92,57 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0, verbose_name="Stock")
     is_active = models.BooleanField(default=True, verbose_name="Actif")
     is_featured = models.BooleanField(default=False, verbose_name="Vedette")
+    # Note moyenne dénormalisée, tenue à jour à l'approbation des avis
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False, verbose_name="Note moyenne")
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Nombre d'avis")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Dernière modification de la fiche (produit, galerie ou avis)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
         ordering = ['-created_at']
+        indexes = [
+            # Accueil : produits vedettes les plus récents
+            models.Index(
+                fields=['-created_at'],
+                condition=ACTIVE & models.Q(is_featured=True),
+                name='product_featured_recent_idx',
+            ),
+            # Fiche produit : produits similaires de la même catégorie. Ordre croissant :
+            # SQLite ajoute l'id en fin d'index, parcouru dans un sens ou dans l'autre
+            # il suit (created_at, id) et départage les dates égales sans tri
+            models.Index(fields=['category', 'created_at'], condition=ACTIVE, name='product_category_created_idx'),
+            # Liste de l'admin, tous produits confondus
+            models.Index(fields=['-created_at'], name='product_recent_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Slug chargé, pour détecter un renommage à l'enregistrement
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if 'description' not in self.get_deferred_fields() and (
+            update_fields is None or 'description' in update_fields
+        ):
+            self.description_html = render_rich_text(self.description)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'description_html'}
+        slugs.save_unique(self, super().save, self.name, *args, **kwargs)
+
+        # L'ancienne URL de la fiche redirige vers la nouvelle
+        old_slug = getattr(self, '_loaded_slug', None)
+        if old_slug and old_slug != self.slug:
+            SlugRedirect.objects.filter(old_slug=self.slug).delete()
+            SlugRedirect.objects.update_or_create(old_slug=old_slug, defaults={'product': self})
+        self._loaded_slug = self.slug
 
     def __str__(self):
         return self.name
@@ -62,8 +153,68 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.reviews.filter(is_approved=True)
-        return reviews.aggregate(models.Avg('rating'))['rating__avg'] or 0
+        return self.rating_avg
+
+class SlugRedirectQuerySet(models.QuerySet):
+
+    def _target(self, old_slug):
+        return self.filter(old_slug=old_slug, product__is_active=True).values_list('product__slug', flat=True)
+
+    def current_slug(self, old_slug):
+        """Slug actuel du produit actif qui portait `old_slug`, ou None."""
+        return self._target(old_slug).first()
+
+    async def acurrent_slug(self, old_slug):
+        return await self._target(old_slug).afirst()
+
+
+class SlugRedirect(models.Model):
+    """Ancien slug d'un produit renommé : son URL redirige (301) vers la fiche actuelle"""
+    old_slug = models.SlugField(max_length=200, unique=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='slug_redirects')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SlugRedirectQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Redirection de slug"
+        verbose_name_plural = "Redirections de slug"
+
+    def __str__(self):
+        return f"{self.old_slug} -> {self.product_id}"
+
+
+class ProductIndex(models.Model):
+    """
+    Index dénormalisé de la boutique : une ligne par produit avec tout ce qu'il
+    faut pour filtrer, compter les facettes et rechercher sans jointure.
+    Tenu à jour par les signaux (core/signals.py) et reconstruit par
+    `manage.py rebuild_product_index`.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_entry')
+    category_slug = models.SlugField(max_length=100)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_bucket = models.PositiveSmallIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+    in_stock = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    search_text = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Index produit"
+        verbose_name_plural = "Index produits"
+        indexes = [
+            # Index partiels : Django traduit is_active=True en « WHERE is_active »,
+            # que SQLite ne sait pas exploiter en tête d'un index composite
+            models.Index(fields=['category_slug', 'price_bucket'], condition=ACTIVE, name='productindex_facets_idx'),
+            models.Index(fields=['category_slug', 'created_at'], condition=ACTIVE, name='productindex_category_idx'),
+            models.Index(fields=['created_at'], condition=ACTIVE, name='productindex_recent_idx'),
+            models.Index(fields=['price'], condition=ACTIVE, name='productindex_price_idx'),
+        ]
+
+    def __str__(self):
+        return f"Index {self.product_id}"
+
 
 class ProductImage(models.Model):
     """Images supplémentaires pour un produit"""
@@ -81,6 +232,60 @@ class ProductImage(models.Model):
         return f"{self.product.name} - Image {self.pk}"
 
 
+class Review(models.Model):
+    """Avis client sur un produit (publié après approbation)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
+    name = models.CharField(max_length=100, verbose_name="Nom")
+    rating = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)], verbose_name="Note"
+    )
+    comment = models.TextField(blank=True, verbose_name="Commentaire")
+    is_approved = models.BooleanField(default=False, verbose_name="Approuvé")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Avis"
+        verbose_name_plural = "Avis"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'is_approved', 'created_at'], name='review_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.rating}/5"
+
+
+class Cart(models.Model):
+    """Panier d'un utilisateur connecté (les visiteurs anonymes utilisent la session)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Panier"
+        verbose_name_plural = "Paniers"
+
+    def __str__(self):
+        return f"Panier de {self.user.username}"
+
+
+class CartItem(models.Model):
+    """Ligne de panier"""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Quantité")
+
+    class Meta:
+        verbose_name = "Ligne de panier"
+        verbose_name_plural = "Lignes de panier"
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cartitem_unique_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id}"
+
+
 class UserProfile(models.Model):
     """Profil utilisateur"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -111,12 +316,143 @@ class Contact(models.Model):
         verbose_name = "Message de contact"
         verbose_name_plural = "Messages de contact"
         ordering = ['-created_at']
+        indexes = [
+            # Liste de l'admin : tous les messages, ou les non lus seulement
+            models.Index(fields=['-created_at'], name='contact_recent_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_read=False), name='contact_unread_recent_idx'),
+            # Recherche de l'admin : email exact, début du nom
+            models.Index(fields=['email'], name='contact_email_idx'),
+            models.Index(fields=['name'], name='contact_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
 
 
 
+class Order(models.Model):
+    """Commande passée depuis la page de paiement"""
+    PENDING = 'pending'
+    PAID = 'paid'
+    EXPIRED = 'expired'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (PENDING, "En attente de paiement"),
+        (PAID, "Payée"),
+        (EXPIRED, "Expirée"),
+        (CANCELLED, "Annulée"),
+    ]
+    SHIPPING_CHOICES = [
+        ('standard', "Standard (5-7 jours)"),
+        ('express', "Express (2-3 jours)"),
+        ('overnight', "Lendemain (1 jour)"),
+    ]
+
+    reference = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    first_name = models.CharField(max_length=100, verbose_name="Prénom")
+    last_name = models.CharField(max_length=100, verbose_name="Nom")
+    email = models.EmailField(verbose_name="Email")
+    phone = models.CharField(max_length=20, blank=True, verbose_name="Téléphone")
+    address = models.CharField(max_length=255, verbose_name="Adresse")
+    address2 = models.CharField(max_length=255, blank=True, verbose_name="Complément d'adresse")
+    city = models.CharField(max_length=100, verbose_name="Ville")
+    state = models.CharField(max_length=100, blank=True, verbose_name="Région")
+    zip_code = models.CharField(max_length=20, verbose_name="Code postal")
+    country = models.CharField(max_length=2, verbose_name="Pays")
+    shipping_method = models.CharField(max_length=20, choices=SHIPPING_CHOICES, default='standard', verbose_name="Livraison")
+    shipping_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Frais de livraison")
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Sous-total")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Total")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, verbose_name="Statut")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Fin de la réservation du stock d'une commande en attente (core/orders.py)
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Réservation jusqu'au")
+
+    class Meta:
+        verbose_name = "Commande"
+        verbose_name_plural = "Commandes"
+        ordering = ['-created_at']
+        indexes = [
+            # Balayage des réservations échues (release_reservations)
+            models.Index(fields=['expires_at'], condition=models.Q(status='pending'), name='order_pending_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Commande {str(self.reference)[:8]} - {self.first_name} {self.last_name}"
+
+
+class OrderItem(models.Model):
+    """Ligne de commande : nom et prix figés au moment de la commande"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_items')
+    product_name = models.CharField(max_length=200, verbose_name="Produit")
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix unitaire")
+    quantity = models.PositiveIntegerField(verbose_name="Quantité")
+
+    class Meta:
+        verbose_name = "Ligne de commande"
+        verbose_name_plural = "Lignes de commande"
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+    @property
+    def total_price(self):
+        return self.unit_price * self.quantity
+
+
+class StockReservation(models.Model):
+    """
+    Stock retiré pour une commande en attente de paiement. Supprimée au
+    paiement ; rendue au stock par la commande release_reservations une
+    fois expirée.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Réservation de stock"
+        verbose_name_plural = "Réservations de stock"
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} jusqu'au {self.expires_at:%d/%m/%Y %H:%M}"
+
+
+class BulkJob(models.Model):
+    """
+    Tâche de fond d'une action de masse de l'admin (core/bulk.py). Tenue en
+    base : son avancement se lit depuis n'importe quel process, et une
+    tâche dont le thread est mort reste repérable (updated_at figé).
+    """
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (RUNNING, "En cours"),
+        (DONE, "Terminée"),
+        (FAILED, "Échouée"),
+    ]
+
+    id = models.CharField(max_length=32, primary_key=True)
+    label = models.CharField(max_length=200, verbose_name="Action")
+    total = models.PositiveIntegerField(verbose_name="Lignes")
+    done = models.PositiveIntegerField(default=0, verbose_name="Lignes traitées")
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=RUNNING, verbose_name="État")
+    started_at = models.DateTimeField(auto_now_add=True, verbose_name="Démarrée le")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernier avancement")
+
+    class Meta:
+        verbose_name = "Action de masse"
+        verbose_name_plural = "Actions de masse"
+
+    def __str__(self):
+        return f"{self.label} ({self.done}/{self.total})"
+
+
+
 
 class SiteInfo(models.Model):
     site_name = models.CharField(max_length=255, default="NaturalBio")
@@ -169,6 +505,9 @@ class HeroSlide(models.Model):
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['order'], condition=ACTIVE, name='heroslide_active_order_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -188,6 +527,9 @@ class Service(models.Model):
         ordering = ['order']
         verbose_name = "Service"
         verbose_name_plural = "Services"
+        indexes = [
+            models.Index(fields=['order'], condition=ACTIVE, name='service_active_order_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,157 @@
+"""
+Passage de commande et réservation du stock.
+
+Le stock est décrémenté par des UPDATE conditionnels :
+
+    UPDATE core_product SET stock = stock - 3 WHERE id = 7 AND stock >= 3
+
+SQLite n'a pas de verrou de ligne (pas de SELECT ... FOR UPDATE) : chaque
+UPDATE vérifie et décrémente le stock en une seule instruction, et toutes
+les lignes d'une commande sont décrémentées dans une même transaction. Si
+un produit n'a plus assez de stock, l'UPDATE ne touche aucune ligne et la
+transaction entière est annulée : deux acheteurs des dernières unités ne
+peuvent pas tous deux les obtenir. Les transactions commencent par une
+écriture (jamais une lecture qui devrait ensuite être promue en écriture)
+et restent courtes : le verrou d'écriture de la base n'est tenu que le
+temps de quelques instructions.
+
+Une commande passée est en attente de paiement : son stock est réservé
+(StockReservation) jusqu'à ORDER_RESERVATION_MINUTES. Le paiement supprime
+la réservation ; à défaut, release_expired() (commande
+release_reservations, à lancer périodiquement) rend le stock. Une commande
+en attente supprimée (admin, cascade) est d'abord annulée
+(core.signals.release_deleted_order).
+
+Invariant : seules les commandes en attente ont des réservations.
+
+Les UPDATE n'émettent pas de signal : l'index de la boutique (en stock ou
+non) et la version des produits de site_cache sont mis à jour ici.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from . import search
+from .cache import site_cache
+from .db import retry_on_locked
+from .models import Order, OrderItem, Product, StockReservation
+
+# Nombre de produits dont le stock est rendu par instruction UPDATE
+RELEASE_BATCH_SIZE = 500
+
+
+class OutOfStock(Exception):
+    """Stock insuffisant (ou produit retiré de la vente) pour une ligne de la commande."""
+
+    def __init__(self, product):
+        self.product = product
+        super().__init__(f"Stock insuffisant : {product.name}")
+
+
+def _stock_changed(product_ids):
+    search.index_products(Product.objects.select_related('category').filter(pk__in=product_ids))
+    site_cache.bump(Product)
+
+
+@retry_on_locked
+def place_order(order, lines):
+    """
+    Enregistre la commande `order` (non enregistrée : coordonnées et mode de
+    livraison) pour les lignes de panier `lines`, et réserve leur stock.
+    Lève OutOfStock sans rien modifier si une ligne ne peut être servie.
+    """
+    quantities, prices, products = {}, {}, {}
+    for line in lines:
+        pk = line.product.pk
+        quantities[pk] = quantities.get(pk, 0) + line.quantity
+        prices[pk] = line.unit_price
+        products[pk] = line.product
+
+    now = timezone.now()
+    order.subtotal = sum((prices[pk] * quantity for pk, quantity in quantities.items()), Decimal('0'))
+    order.shipping_cost = settings.ORDER_SHIPPING_COSTS[order.shipping_method]
+    order.total = order.subtotal + order.shipping_cost
+    order.status = Order.PENDING
+    order.expires_at = now + timedelta(minutes=settings.ORDER_RESERVATION_MINUTES)
+
+    with transaction.atomic():
+        for pk in sorted(quantities):
+            quantity = quantities[pk]
+            reserved = Product.objects.filter(pk=pk, is_active=True, stock__gte=quantity).update(
+                stock=F('stock') - quantity, updated_at=now,
+            )
+            if not reserved:
+                raise OutOfStock(products[pk])
+        order.save()
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order, product_id=pk, product_name=products[pk].name,
+                unit_price=prices[pk], quantity=quantity,
+            )
+            for pk, quantity in quantities.items()
+        ])
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=pk, quantity=quantity, expires_at=order.expires_at)
+            for pk, quantity in quantities.items()
+        ])
+
+    _stock_changed(list(quantities))
+    return order
+
+
+@retry_on_locked
+def confirm_payment(order):
+    """
+    Passe une commande en attente à l'état payé et supprime ses
+    réservations : le stock reste décompté. False si la commande n'était
+    plus en attente (déjà payée, annulée ou expirée).
+    """
+    with transaction.atomic():
+        paid = Order.objects.filter(pk=order.pk, status=Order.PENDING).update(status=Order.PAID, expires_at=None)
+        if paid:
+            StockReservation.objects.filter(order=order.pk).delete()
+    if paid:
+        order.status, order.expires_at = Order.PAID, None
+    return bool(paid)
+
+
+@retry_on_locked
+def _release(orders, status):
+    """Passe les commandes en attente de `orders` au statut `status` et rend leur stock."""
+    now = timezone.now()
+    with transaction.atomic():
+        pending = list(orders.filter(status=Order.PENDING).values_list('pk', flat=True))
+        # Le statut est revérifié à l'UPDATE : une commande payée entre-temps
+        # n'est pas touchée, et ses réservations (supprimées) ne sont pas lues
+        count = Order.objects.filter(pk__in=pending, status=Order.PENDING).update(status=status)
+        if not count:
+            return 0
+        reservations = StockReservation.objects.filter(order__in=pending, order__status=status)
+        quantities = dict(
+            reservations.order_by('product').values_list('product').annotate(quantity=Sum('quantity'))
+        )
+        pks = sorted(quantities)
+        for start in range(0, len(pks), RELEASE_BATCH_SIZE):
+            batch = pks[start:start + RELEASE_BATCH_SIZE]
+            Product.objects.filter(pk__in=batch).update(
+                stock=F('stock') + Case(*(When(pk=pk, then=Value(quantities[pk])) for pk in batch), default=0),
+                updated_at=now,
+            )
+        reservations.delete()
+
+    _stock_changed(pks)
+    return count
+
+
+def release_expired():
+    """Expire les commandes dont la réservation est échue et rend leur stock ; nombre de commandes."""
+    return _release(Order.objects.filter(expires_at__lte=timezone.now()), Order.EXPIRED)
+
+
+def cancel_orders(order_ids):
+    """Annule les commandes en attente parmi `order_ids` et rend leur stock ; nombre de commandes."""
+    return _release(Order.objects.filter(pk__in=order_ids), Order.CANCELLED)
@@ -0,0 +1,85 @@
+"""
+Pagination par curseur (keyset) sur (created_at, id).
+
+Contrairement à OFFSET, le coût d'une page ne dépend pas de sa profondeur :
+la requête reprend directement après le dernier produit affiché.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+# Plus grand entier accepté par SQLite : au-delà, la requête lèverait OverflowError
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(obj):
+    """Encode la position (created_at, id) d'un objet dans un jeton d'URL."""
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un jeton ; retourne (created_at, id) ou None s'il est invalide."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return (created_at, pk) if 0 <= pk <= MAX_PK else None
+
+
+class KeysetPage:
+    """Page obtenue par curseur, compatible avec l'itération dans les templates."""
+    def __init__(self, object_list, has_next, cursor=None):
+        self.object_list = object_list
+        self.cursor = cursor
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+
+def _keyset_queryset(queryset, cursor, per_page):
+    queryset = queryset.order_by('-created_at', '-pk')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+    # Une ligne de plus pour savoir s'il existe une page suivante, sans COUNT(*)
+    return queryset[:per_page + 1], position
+
+
+def keyset_page(queryset, cursor, per_page):
+    """
+    Retourne la page suivant `cursor` dans `queryset`, trié par
+    (-created_at, -id). Un curseur invalide ramène à la première page.
+    """
+    queryset, position = _keyset_queryset(queryset, cursor, per_page)
+    rows = list(queryset)
+    return KeysetPage(rows[:per_page], len(rows) > per_page, cursor if position else None)
+
+
+async def akeyset_page(queryset, cursor, per_page):
+    """Variante asynchrone de keyset_page."""
+    queryset, position = _keyset_queryset(queryset, cursor, per_page)
+    rows = [row async for row in queryset]
+    return KeysetPage(rows[:per_page], len(rows) > per_page, cursor if position else None)
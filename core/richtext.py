@@ -0,0 +1,158 @@
+"""
+Rendu des descriptions en texte riche (CKEditor).
+
+Le HTML saisi dans l'admin est nettoyé une fois, à l'enregistrement du
+produit, et stocké dans Product.description_html :
+- seules les balises et attributs de la liste blanche sont conservés
+  (pas de script, d'iframe, d'attribut on*, ni d'URL javascript:) ;
+- les images téléversées via CKEditor (CKEDITOR_UPLOAD_PATH) pointent vers
+  leurs déclinaisons optimisées (srcset WebP + repli JPEG, voir core/images.py) ;
+- toutes les images sont chargées en différé (loading="lazy").
+
+La fiche produit affiche directement ce HTML précalculé.
+"""
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from . import images
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure',
+    'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span',
+    'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Balises supprimées avec tout leur contenu
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template', 'svg', 'math'}
+
+ALLOWED_ATTRS = {
+    '*': {'style', 'title'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start'},
+}
+URL_ATTRS = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+
+def _safe_url(value):
+    # Les navigateurs ignorent les caractères de contrôle et espaces dans le schéma
+    cleaned = ''.join(ch for ch in value if ch > ' ').strip()
+    try:
+        return urlsplit(cleaned).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+def _safe_style(value):
+    lowered = value.lower()
+    return not any(token in lowered for token in ('url(', 'expression', 'javascript:', '@import'))
+
+
+def _upload_name(src):
+    """Nom dans le stockage d'une image téléversée par CKEditor, sinon None."""
+    media_url = default_storage.url('')
+    if not src.startswith(media_url):
+        return None
+    name = unquote(urlsplit(src).path[len(media_url):])
+    return name if name.startswith(settings.CKEDITOR_UPLOAD_PATH) else None
+
+
+class _Sanitizer(HTMLParser):
+
+    def __init__(self, generate):
+        super().__init__(convert_charrefs=True)
+        self.generate = generate
+        self.out = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRS['*'] | ALLOWED_ATTRS.get(tag, set())
+        clean = {}
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            if name == 'style' and not _safe_style(value):
+                continue
+            clean[name] = value
+        if tag == 'img':
+            if 'src' not in clean:
+                return
+            self._rewrite_image(clean)
+        elif tag == 'a' and clean.get('target') == '_blank':
+            clean['rel'] = 'noopener noreferrer'
+        self._emit_tag(tag, clean)
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            # <svg/> : aucun contenu à écarter, aucune fermeture à attendre
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Ferme aussi les balises laissées ouvertes à l'intérieur
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.out.append(f'</{current}>')
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.out.append(escape(data, quote=False))
+
+    def _rewrite_image(self, attrs):
+        name = _upload_name(attrs['src'])
+        if name:
+            if self.generate:
+                images.generate(name, ['content'])
+            if images.has_derivatives(name, 'content'):
+                attrs['src'] = images.fallback_url(name, 'content')
+                attrs['srcset'] = images.srcset(name, 'content')
+                attrs['sizes'] = images.RENDITIONS['content']['sizes']
+        attrs['loading'] = 'lazy'
+        attrs['decoding'] = 'async'
+
+    def _emit_tag(self, tag, attrs):
+        rendered = ''.join(f' {name}="{escape(value)}"' for name, value in attrs.items())
+        self.out.append(f'<{tag}{rendered}>')
+
+    def result(self):
+        self.close()
+        return ''.join(self.out) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def render_rich_text(html, generate=True):
+    """
+    Retourne le HTML nettoyé et optimisé d'un texte riche.
+    `generate=False` n'utilise que les déclinaisons déjà présentes.
+    """
+    if not html:
+        return ''
+    parser = _Sanitizer(generate)
+    parser.feed(html)
+    return parser.result()
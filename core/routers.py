@@ -0,0 +1,27 @@
+from django.db import connections
+
+
+class ReadOnlyRouter:
+    """
+    Envoie les lectures sur l'alias 'reader' (connexion SQLite en lecture
+    seule) et les écritures sur 'default'.
+
+    Dans une transaction ouverte sur 'default', les lectures restent sur
+    'default' pour voir les écritures non encore validées.
+    """
+    read_alias = 'reader'
+
+    def db_for_read(self, model, **hints):
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return self.read_alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les deux alias pointent vers le même fichier
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
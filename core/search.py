@@ -0,0 +1,180 @@
+"""
+Index de recherche et facettes de la boutique.
+
+Le modèle ProductIndex contient une ligne dénormalisée par produit. Sous SQLite,
+une table virtuelle FTS5 (core_productsearch, créée par la migration 0004 et
+synchronisée par triggers) fournit la recherche plein texte ; sur les autres
+bases, on se rabat sur des filtres icontains.
+"""
+import re
+from bisect import bisect_right
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+from .models import Product, ProductIndex
+
+FTS_TABLE = 'core_productsearch'
+
+INDEXED_FIELDS = ['category_slug', 'price', 'price_bucket', 'is_active', 'in_stock', 'created_at', 'search_text']
+
+_fts_tables = {}
+
+
+def fts_available():
+    """Indique si la table FTS5 existe sur la base courante (mémorisé)."""
+    key = connection.settings_dict['NAME']
+    if key not in _fts_tables:
+        _fts_tables[key] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[key]
+
+
+# ------------------------
+# TRANCHES DE PRIX
+# ------------------------
+
+def price_bucket(price):
+    """Numéro de la tranche de prix (0 = moins cher) selon SHOP_PRICE_BUCKETS."""
+    return bisect_right(settings.SHOP_PRICE_BUCKETS, price)
+
+
+def price_bucket_expression(field='price'):
+    """Équivalent SQL de price_bucket(), pour les mises à jour en masse de l'index."""
+    return Case(
+        *(When(**{f'{field}__lt': bound}, then=Value(i)) for i, bound in enumerate(settings.SHOP_PRICE_BUCKETS)),
+        default=Value(len(settings.SHOP_PRICE_BUCKETS)),
+    )
+
+
+def price_buckets():
+    """Retourne la liste des tranches : [(numéro, min, max), ...]."""
+    bounds = [None] + list(settings.SHOP_PRICE_BUCKETS) + [None]
+    return [(i, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def parse_price(value):
+    """Convertit un paramètre GET en Decimal, ou None s'il est vide/invalide (NaN, infini compris)."""
+    try:
+        price = Decimal(value) if value else None
+    except InvalidOperation:
+        return None
+    return price if price is not None and price.is_finite() else None
+
+
+# ------------------------
+# ALIMENTATION DE L'INDEX
+# ------------------------
+
+def build_entry(product, category_slug=None):
+    """Construit (sans l'enregistrer) la ligne d'index d'un produit."""
+    return ProductIndex(
+        product_id=product.pk,
+        category_slug=category_slug or product.category.slug,
+        price=product.price,
+        price_bucket=price_bucket(product.price),
+        is_active=product.is_active,
+        in_stock=product.stock > 0,
+        created_at=product.created_at,
+        search_text=f"{product.name} {strip_tags(product.description)}",
+    )
+
+
+def index_products(products):
+    """Insère ou met à jour les lignes d'index de ces produits (un seul upsert)."""
+    entries = [build_entry(product) for product in products]
+    if entries:
+        ProductIndex.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=INDEXED_FIELDS,
+        )
+    return len(entries)
+
+
+def rebuild_index(batch_size=500):
+    """
+    Reconstruit entièrement l'index, par lots de `batch_size` produits, dans
+    une seule transaction : la boutique lit l'ancien index jusqu'à la fin.
+    """
+    products = Product.objects.select_related('category').order_by('pk')
+    total = 0
+    batch = []
+    with transaction.atomic():
+        ProductIndex.objects.all().delete()
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                total += index_products(batch)
+                batch = []
+        total += index_products(batch)
+    return total
+
+
+# ------------------------
+# RECHERCHE ET FACETTES
+# ------------------------
+
+def search(entries, text):
+    """Restreint un queryset de ProductIndex aux produits correspondant à `text`."""
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return entries
+    if fts_available():
+        # Chaque terme est cité puis recherché en préfixe : "parq"* trouve "parquet"
+        expression = ' '.join(f'"{term}"*' for term in terms)
+        return entries.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]
+        ))
+    for term in terms:
+        entries = entries.filter(search_text__icontains=term)
+    return entries
+
+
+def facet_counts(entries, selected_categories=()):
+    """
+    Calcule en une seule requête GROUP BY les facettes d'un queryset d'index
+    (non filtré par catégorie) :
+    - nombre de produits par catégorie ;
+    - nombre de produits par tranche de prix, dans les catégories sélectionnées.
+    """
+    return _fold_facets(_facet_rows(entries), selected_categories)
+
+
+async def afacet_counts(entries, selected_categories=()):
+    rows = [row async for row in _facet_rows(entries)]
+    return _fold_facets(rows, selected_categories)
+
+
+def _facet_rows(entries):
+    return entries.order_by().values('category_slug', 'price_bucket').annotate(n=Count('pk'))
+
+
+def _fold_facets(rows, selected_categories):
+    categories = {}
+    buckets = {}
+    for row in rows:
+        categories[row['category_slug']] = categories.get(row['category_slug'], 0) + row['n']
+        if not selected_categories or row['category_slug'] in selected_categories:
+            buckets[row['price_bucket']] = buckets.get(row['price_bucket'], 0) + row['n']
+    return categories, buckets
+
+
+def hydrate(entries):
+    """Charge les produits correspondant à des lignes d'index, dans le même ordre."""
+    entries = list(entries)
+    products = Product.objects.for_listing().in_bulk([entry.pk for entry in entries])
+    return [products[entry.pk] for entry in entries if entry.pk in products]
+
+
+async def ahydrate(entries):
+    entries = list(entries)
+    products = await Product.objects.for_listing().ain_bulk([entry.pk for entry in entries])
+    return [products[entry.pk] for entry in entries if entry.pk in products]
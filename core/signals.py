@@ -0,0 +1,70 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import images, orders, search
+from .cart import merge_session_cart
+from .cache import site_cache
+from .models import Category, HeroSlide, Order, Product, ProductImage, ProductIndex, Review
+
+
+@receiver([post_save, post_delete], dispatch_uid='core_bump_model_version')
+def bump_model_version(sender, **kwargs):
+    """Invalide le cache versionné à chaque modification d'un modèle de l'app core."""
+    if sender._meta.app_label == 'core':
+        site_cache.bump(sender)
+
+
+@receiver(post_save, sender=Product, dispatch_uid='core_index_product')
+def index_product(sender, instance, raw=False, **kwargs):
+    """Met à jour la ligne d'index de la boutique du produit enregistré."""
+    if not raw:
+        search.index_products([instance])
+
+
+@receiver(post_save, sender=Category, dispatch_uid='core_index_category')
+def reindex_category(sender, instance, raw=False, **kwargs):
+    """Répercute un changement de slug de catégorie sur l'index."""
+    if not raw:
+        ProductIndex.objects.filter(product__category=instance).exclude(
+            category_slug=instance.slug
+        ).update(category_slug=instance.slug)
+
+
+@receiver([post_save, post_delete], sender=Review, dispatch_uid='core_refresh_rating')
+def refresh_product_rating(sender, instance, raw=False, **kwargs):
+    """Recalcule la note dénormalisée du produit à chaque approbation/modification d'avis."""
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).refresh_ratings()
+        # bulk_update n'émet pas de signal : on invalide le cache produit nous-mêmes
+        site_cache.bump(Product)
+
+
+@receiver([post_save, post_delete], sender=ProductImage, dispatch_uid='core_touch_product')
+def touch_product(sender, instance, raw=False, **kwargs):
+    """Une modification de la galerie modifie la fiche du produit."""
+    if not raw:
+        Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product, dispatch_uid='core_product_derivatives')
+@receiver(post_save, sender=ProductImage, dispatch_uid='core_productimage_derivatives')
+@receiver(post_save, sender=HeroSlide, dispatch_uid='core_heroslide_derivatives')
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Génère les déclinaisons responsives des images téléversées."""
+    if not raw:
+        images.generate_for_instance(instance)
+
+
+@receiver(pre_delete, sender=Order, dispatch_uid='core_release_deleted_order')
+def release_deleted_order(sender, instance, **kwargs):
+    """Une commande en attente supprimée (admin, cascade) rend d'abord son stock réservé."""
+    orders.cancel_orders([instance.pk])
+
+
+@receiver(user_logged_in, dispatch_uid='core_merge_cart')
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Reprend le panier anonyme de la session dans le panier de l'utilisateur."""
+    if request is not None and hasattr(request, 'session'):
+        merge_session_cart(request.session, user)
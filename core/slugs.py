@@ -0,0 +1,132 @@
+"""
+Attribution de slugs uniques (produits, catégories).
+
+Un slug libre est choisi parmi base, base-2, base-3... d'après une seule
+requête, qui lit sur l'index unique du champ les slugs déjà pris de la
+forme base ou base-… :
+
+    WHERE slug = 'savon' OR (slug > 'savon-' AND slug < 'savon.')
+
+('.' suit immédiatement '-' dans l'ordre des caractères.) allocate_many()
+fait de même pour un lot de bases en une requête par centaine de bases,
+en résolvant aussi les doublons à l'intérieur du lot (imports en masse).
+
+Les anciens slugs encore redirigés (SlugRedirect, relation inverse
+`slug_redirects` des produits) comptent comme pris : un nouveau produit
+qui en reprendrait un casserait la redirection 301. Ils sont lus dans la
+même requête (UNION).
+
+Deux enregistrements simultanés peuvent choisir le même slug : la
+contrainte d'unicité de la base tranche, et save_unique() refait alors
+l'attribution. Le surcoût ne concerne que ce cas, jamais l'enregistrement
+courant.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+# Place réservée au suffixe (-2, -3...) quand la base est tronquée
+SUFFIX_ROOM = 6
+# Nombre de bases par requête dans allocate_many()
+BATCH_SIZE = 100
+ATTEMPTS = 3
+
+
+def unique_slug(base, taken, max_length=200):
+    """Premier slug libre parmi base, base-2, base-3... ; l'ajoute à `taken`."""
+    slug, n = base, 2
+    while slug in taken:
+        suffix = f"-{n}"
+        slug = f"{base[:max_length - len(suffix)]}{suffix}"
+        n += 1
+    taken.add(slug)
+    return slug
+
+
+def _base(model, value):
+    max_length = model._meta.get_field('slug').max_length
+    base = slugify(value)[:max_length - SUFFIX_ROOM].strip('-')
+    return base or model._meta.model_name, max_length
+
+
+def _family(base, field='slug'):
+    return Q(**{field: base}) | Q(**{f'{field}__gt': f"{base}-", f'{field}__lt': f"{base}."})
+
+
+def _taken(model, family, exclude_pk=None, instances=True):
+    """
+    Slugs pris dans `family` (fabrique de Q par champ) : ceux des instances
+    (sauf instances=False) et les anciens slugs redirigés.
+    """
+    queryset = None
+    if instances:
+        queryset = model._default_manager.filter(family('slug'))
+        if exclude_pk is not None:
+            queryset = queryset.exclude(pk=exclude_pk)
+        queryset = queryset.order_by().values_list('slug', flat=True)
+    redirects = getattr(model, 'slug_redirects', None)
+    if redirects is not None:
+        retired = redirects.rel.related_model._default_manager.filter(family('old_slug'))
+        if exclude_pk is not None:
+            # Un produit peut reprendre ses propres anciens slugs
+            retired = retired.exclude(**{redirects.field.name: exclude_pk})
+        retired = retired.order_by().values_list('old_slug', flat=True)
+        queryset = retired if queryset is None else queryset.union(retired)
+    return set() if queryset is None else set(queryset)
+
+
+def allocate(model, value, exclude_pk=None):
+    """Slug libre pour `value` (un nom) parmi les instances de `model`, en une requête."""
+    base, max_length = _base(model, value)
+    taken = _taken(model, lambda field: _family(base, field), exclude_pk)
+    return unique_slug(base, taken, max_length)
+
+
+def allocate_many(model, values, taken=None, instances=True):
+    """
+    Slugs libres et distincts pour une liste de noms, dans le même ordre.
+    `taken` : slugs déjà réservés par l'appelant, complété des slugs
+    attribués. instances=False ne réserve que les anciens slugs redirigés :
+    le slug d'une instance existante peut être rendu (import qui met à jour
+    les produits par slug).
+    """
+    bases = [_base(model, value) for value in values]
+    distinct = list({base for base, _ in bases})
+    if taken is None:
+        taken = set()
+    for start in range(0, len(distinct), BATCH_SIZE):
+        chunk = distinct[start:start + BATCH_SIZE]
+
+        def family(field, chunk=chunk):
+            q = Q()
+            for base in chunk:
+                q |= _family(base, field)
+            return q
+
+        taken |= _taken(model, family, instances=instances)
+    return [unique_slug(base, taken, max_length) for base, max_length in bases]
+
+
+def save_unique(instance, save, value, *args, **kwargs):
+    """
+    Enregistre `instance` avec `save(*args, **kwargs)`. Si son slug est
+    vide, lui attribue d'abord un slug libre tiré de `value`, et recommence
+    l'attribution si un enregistrement concurrent a pris le même slug.
+    """
+    if instance.slug:
+        return save(*args, **kwargs)
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None:
+        kwargs['update_fields'] = {*update_fields, 'slug'}
+    model = type(instance)
+    for attempt in range(1, ATTEMPTS + 1):
+        instance.slug = allocate(model, value, exclude_pk=instance.pk)
+        try:
+            # Point de sauvegarde : l'échec n'annule pas la transaction englobante
+            with transaction.atomic():
+                return save(*args, **kwargs)
+        except IntegrityError:
+            taken = model._default_manager.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+            if attempt == ATTEMPTS or not taken:
+                instance.slug = ''
+                raise
@@ -0,0 +1,46 @@
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import site_cache
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, models):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.models = models
+
+    def render(self, context):
+        models = [model.resolve(context) for model in self.models]
+        versions = '-'.join(str(version) for version in site_cache.versions(*models))
+        key = f"fragment:{self.fragment_name}:{versions}"
+        cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+        content = cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, settings.FRAGMENT_CACHE_TIMEOUT)
+        return content
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """
+    Met en cache un fragment de template tant que les modèles listés ne changent pas.
+
+    Usage : {% versioned_cache 'home_hero' 'core.heroslide' %} ... {% endversioned_cache %}
+
+    La clé contient la version de chaque modèle (voir core/cache.py) : toute
+    sauvegarde d'un de ces modèles invalide le fragment.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' attend un nom de fragment et au moins un modèle."
+        )
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    fragment_name = bits[1].strip('\'"')
+    return VersionedCacheNode(nodelist, fragment_name, [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,45 @@
+from django import template
+from django.utils.html import format_html
+
+from core import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(field_file, rendition, alt='', css_class='', loading='lazy'):
+    """
+    Affiche une image avec ses déclinaisons WebP (srcset) et un JPEG de repli.
+
+    Usage : {% responsive_image product.image 'card' alt=product.name css_class="w-full h-56" %}
+
+    Si les déclinaisons n'ont pas encore été générées, l'image originale est servie.
+    """
+    if not field_file:
+        return ''
+    if not images.has_derivatives(field_file.name, rendition):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            field_file.url, alt, css_class, loading,
+        )
+    return format_html(
+        '<picture class="contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        images.srcset(field_file.name, rendition),
+        images.RENDITIONS[rendition]['sizes'],
+        images.fallback_url(field_file.name, rendition),
+        alt, css_class, loading,
+    )
+
+
+@register.filter
+def derivative_url(field_file, rendition):
+    """URL de la déclinaison WebP principale d'une image (ou de l'original)."""
+    if not field_file:
+        return ''
+    if images.has_derivatives(field_file.name, rendition):
+        width = images.RENDITIONS[rendition]['fallback']
+        return images.default_storage.url(images.derivative_name(field_file.name, width, 'webp'))
+    return field_file.url
@@ -0,0 +1,18 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def shop_page_url(context, number):
+    """
+    Lien vers une page de la boutique : /shop/page/<n>/ pour la liste non
+    filtrée (pages exportables en statique), ?page=<n> sinon.
+    """
+    if context.get('path_pagination'):
+        return reverse('shop') if number == 1 else reverse('shop_page', args=[number])
+    query = context['request'].GET.copy()
+    query.pop('cursor', None)
+    query['page'] = number
+    return f"{reverse('shop')}?{query.urlencode()}"
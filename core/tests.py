@@ -1,3 +1,1418 @@
-from django.test import TestCase
+import base64
+import importlib
+import os
+import runpy
+import tempfile
+import time
+import zipfile
+from io import BytesIO, StringIO
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import bulk, feeds, images, intake, orders, search, slugs
+from . import urls as core_urls
+from .cache import get_categories, get_services, get_site_info, site_cache
+from .cart import CartLine
+from .db import retry_on_locked
+from .models import (
+    BulkJob, Cart, CartItem, Category, Contact, HeroSlide, Order, Product, ProductImage, ProductIndex,
+    Review, Service, SiteInfo, SlugRedirect, StockReservation,
+)
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .richtext import render_rich_text
+from .routers import ReadOnlyRouter
+from .views import similar_querysets
+
+
+class QueryPlanTests(TestCase):
+    """
+    Vérifie avec EXPLAIN QUERY PLAN que les requêtes des vues passent par un
+    index : une croissance du catalogue ne doit pas se traduire par des
+    parcours complets de table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Carrelage", slug="carrelage")
+        cls.product = Product.objects.create(
+            name="Produit", slug="produit", description="...", price=Decimal('15000'),
+            image='products/test.jpg', category=cls.category, stock=3, is_featured=True,
+        )
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            if 'SCAN' in line or 'SEARCH' in line:
+                self.assertIn('USING', line, f"Parcours complet de table :\n{plan}")
+        if index_name:
+            self.assertIn(index_name, plan)
+
+    def test_home_featured_products(self):
+        qs = Product.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:6]
+        self.assertUsesIndex(qs, 'product_featured_recent_idx')
+
+    def test_home_hero_slides(self):
+        self.assertUsesIndex(HeroSlide.objects.filter(is_active=True), 'heroslide_active_order_idx')
+
+    def test_active_services(self):
+        self.assertUsesIndex(Service.objects.filter(is_active=True), 'service_active_order_idx')
+
+    def test_similar_products(self):
+        for qs in similar_querysets(self.product):
+            qs = qs[:4]
+            self.assertUsesIndex(qs, 'product_category_created_idx')
+            # Lecture dans l'ordre de l'index, sans tri de toute la catégorie
+            self.assertNotIn('TEMP B-TREE', qs.explain())
+
+    def test_shop_listing(self):
+        qs = ProductIndex.objects.filter(is_active=True).order_by('-created_at', '-pk')
+        self.assertUsesIndex(qs, 'productindex_recent_idx')
+
+    def test_shop_category_filter(self):
+        qs = ProductIndex.objects.filter(is_active=True, category_slug__in=['carrelage'])
+        self.assertUsesIndex(qs.order_by('-created_at', '-pk'))
+
+    def test_shop_price_filter(self):
+        qs = ProductIndex.objects.filter(is_active=True, price__gte=10000, price__lt=20000)
+        self.assertUsesIndex(qs, 'productindex_price_idx')
+
+    def test_shop_facets(self):
+        qs = (
+            ProductIndex.objects.filter(is_active=True)
+            .values('category_slug', 'price_bucket')
+            .order_by()
+            .annotate(n=Count('pk'))
+        )
+        self.assertUsesIndex(qs, 'productindex_facets_idx')
+
+    def test_admin_changelists(self):
+        self.assertUsesIndex(Product.objects.order_by('-created_at', '-pk')[:100], 'product_recent_idx')
+        contacts = Contact.objects.order_by('-created_at', '-pk')
+        self.assertUsesIndex(contacts[:100], 'contact_recent_idx')
+        self.assertUsesIndex(contacts.filter(is_read=False)[:100], 'contact_unread_recent_idx')
+        self.assertUsesIndex(contacts.filter(email='a@example.com'), 'contact_email_idx')
+        self.assertUsesIndex(contacts.filter(name__gte='Ab', name__lt='Ab\U0010ffff'), 'contact_name_idx')
+
+    def test_slug_allocation(self):
+        qs = Product.objects.filter(slugs._family('produit')).values_list('slug', flat=True)
+        self.assertUsesIndex(qs)
+
+    def test_fts_triggers_survive_index_migrations(self):
+        # Les index de ProductIndex sont recréés sans reconstruire la table :
+        # les triggers de synchronisation FTS5 doivent toujours exister
+        if not search.fts_available():
+            self.skipTest("FTS5 indisponible")
+        self.assertEqual(list(search.search(ProductIndex.objects.all(), 'produi')), [self.product.search_entry])
+
+    def test_fts_update_trigger_only_follows_search_text(self):
+        if not search.fts_available():
+            self.skipTest("FTS5 indisponible")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'core_productindex_au'")
+            self.assertIn('AFTER UPDATE OF search_text ON', cursor.fetchone()[0])
+        entries = ProductIndex.objects.filter(product=self.product)
+        entries.update(price=Decimal('1'), is_active=False)
+        entries.update(search_text="Huile de baobab")
+        self.assertEqual(list(search.search(ProductIndex.objects.all(), 'baobab')), list(entries))
+        self.assertFalse(search.search(ProductIndex.objects.all(), 'produi').exists())
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# Échelle du catalogue synthétique. Valeurs modestes par défaut pour la CI ;
+# exemple en charge réelle : PERF_PRODUCTS=10000 PERF_CATEGORIES=50 manage.py test
+PERF_PRODUCTS = _env_int('PERF_PRODUCTS', 600)
+PERF_CATEGORIES = _env_int('PERF_CATEGORIES', 12)
+PERF_IMAGES = _env_int('PERF_IMAGES', 5)
+PERF_RUNS = _env_int('PERF_RUNS', 15)
+# Budget de temps de rendu (p95, en millisecondes), commun à toutes les vues
+PERF_P95_MS = _env_int('PERF_P95_MS', 250)
+
+
+class ViewPerformanceTests(TestCase):
+    """
+    Budgets de requêtes SQL et de temps de rendu des vues publiques, sur un
+    catalogue synthétique. Un N+1 (requête par carte produit, par image...)
+    fait dépasser le budget quelle que soit la taille du catalogue.
+    """
+
+    # Nombre maximum de requêtes par vue, cache froid compris (site_info,
+    # services... sont chargés au premier rendu puis servis par site_cache)
+    QUERY_BUDGETS = {
+        'home': 5,
+        'shop': 7,
+        'shop_filtered': 7,
+        'shop_search': 8,
+        'product_detail': 7,
+        'contact': 2,
+        'contact_post': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create([
+            Category(name=f"Catégorie {i}", slug=f"categorie-{i}") for i in range(PERF_CATEGORIES)
+        ])
+        Product.objects.bulk_create([
+            Product(
+                name=f"Produit {i}", slug=f"produit-{i}", description=f"<p>Description {i}</p>",
+                price=Decimal(1000 + (i * 733) % 150000), image=f"products/perf-{i}.jpg",
+                category=categories[i % len(categories)], stock=i % 7,
+                is_featured=i % 10 == 0, is_active=i % 25 != 0,
+            )
+            for i in range(PERF_PRODUCTS)
+        ], batch_size=500)
+        products = list(Product.objects.only('pk'))
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f"products/additional/perf-{product.pk}-{n}.jpg", order=n)
+            for product in products for n in range(PERF_IMAGES)
+        ], batch_size=1000)
+        Review.objects.bulk_create([
+            Review(product=product, name="Client", rating=1 + product.pk % 5, comment="Bien", is_approved=True)
+            for product in products[::3]
+        ], batch_size=500)
+        Product.objects.all().refresh_ratings()
+        search.rebuild_index()
+        Service.objects.create(title="Pose", icon="fas fa-tools", description="...", details="a\nb",
+                               whatsapp_link="https://wa.me/0")
+        HeroSlide.objects.create(title="Slide", image="hero_slides/perf.jpg")
+        cls.product = Product.objects.filter(is_active=True, rating_count__gt=0).first()
+        cls.category = categories[0]
+
+    def setUp(self):
+        site_cache.clear()
+        cache.clear()
+        caches['ratelimit'].clear()
+
+    def measure(self, budget_name, method, url, data=None):
+        """Appelle la vue PERF_RUNS fois et vérifie les budgets de requêtes et de p95."""
+        timings = []
+        worst = []
+        for _ in range(PERF_RUNS):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = getattr(self.client, method)(url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            self.assertIn(response.status_code, (200, 302))
+            if len(queries) > len(worst):
+                worst = queries.captured_queries
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+        budget = self.QUERY_BUDGETS[budget_name]
+        self.assertLessEqual(
+            len(worst), budget,
+            f"{budget_name} : {len(worst)} requêtes (budget {budget})\n"
+            + "\n".join(q['sql'] for q in worst),
+        )
+        self.assertLessEqual(p95, PERF_P95_MS, f"{budget_name} : p95 {p95:.0f} ms (budget {PERF_P95_MS} ms)")
+        return len(worst), p95
+
+    def test_home(self):
+        self.measure('home', 'get', reverse('home'))
+
+    def test_shop(self):
+        self.measure('shop', 'get', reverse('shop'), {'page': 3})
+
+    def test_shop_path_page(self):
+        # Pages exportées en statique (manage.py export_static)
+        self.measure('shop', 'get', reverse('shop_page', args=[3]))
+        response = self.client.get(reverse('shop_page', args=[3]))
+        self.assertContains(response, f'href="{reverse("shop_page", args=[4])}"')
+
+    def test_shop_filtered(self):
+        self.measure('shop_filtered', 'get', reverse('shop'), {
+            'category': [self.category.slug, 'categorie-1'], 'price_min': '5000', 'price_max': '80000',
+        })
+
+    def test_shop_search(self):
+        self.measure('shop_search', 'get', reverse('shop'), {'q': 'produit 1'})
+
+    def test_product_detail(self):
+        self.measure('product_detail', 'get', reverse('product_detail', args=[self.product.slug]))
+
+    def test_product_detail_oldest_in_category(self):
+        # Produits similaires complétés par les plus récents : une requête de plus
+        oldest = Product.objects.filter(category=self.category, is_active=True).order_by('created_at').first()
+        self.measure('product_detail', 'get', reverse('product_detail', args=[oldest.slug]))
+
+    def test_pages_never_load_raw_descriptions(self):
+        for url, data in [
+            (reverse('home'), None),
+            (reverse('shop'), {'page': 2}),
+            (reverse('product_detail', args=[self.product.slug]), None),
+        ]:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, data)
+            # La fiche produit elle-même n'utilise que description_html
+            loaded = [q['sql'] for q in queries if '"core_product"."description"' in q['sql']]
+            self.assertEqual(loaded, [])
+
+    def test_contact(self):
+        self.measure('contact', 'get', reverse('contact'))
+
+    @override_settings(CONTACT_INTAKE_EAGER=True, CONTACT_RATE_LIMIT=(1000, 600))
+    def test_contact_post(self):
+        self.measure('contact_post', 'post', reverse('contact'), {
+            'name': "Client", 'email': "client@example.com", 'subject': "Devis", 'message': "Bonjour",
+        })
+
+
+class SiteCacheTests(TestCase):
+    """Cache versionné des données globales (core/cache.py)."""
+
+    def setUp(self):
+        site_cache.clear()
+
+    def test_save_invalidates_site_info(self):
+        site = SiteInfo.objects.create(site_name="NaturalBio")
+        with self.assertNumQueries(1):
+            self.assertEqual(get_site_info().site_name, "NaturalBio")
+        with self.assertNumQueries(0):
+            get_site_info()
+        site.site_name = "Herbal"
+        site.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_site_info().site_name, "Herbal")
+
+    def test_save_and_delete_invalidate_lists(self):
+        service = Service.objects.create(title="Pose", icon="fas fa-tools", description="...", details="a",
+                                         whatsapp_link="https://wa.me/0")
+        self.assertEqual(get_services(active_only=True), [service])
+        self.assertEqual(get_categories(), [])
+
+        category = Category.objects.create(name="Savons")
+        self.assertEqual(get_categories(), [category])
+        service.is_active = False
+        service.save()
+        self.assertEqual(get_services(active_only=True), [])
+        self.assertEqual(get_services(), [service])
+        service.delete()
+        self.assertEqual(get_services(), [])
+
+    def test_unknown_version_is_a_miss(self):
+        Category.objects.create(name="Savons")
+        get_categories()
+        # Versions perdues (cache vidé, purgé, autre process) : les valeurs du process ne sont plus servies
+        site_cache.store.clear()
+        with self.assertNumQueries(1):
+            get_categories()
+        with self.assertNumQueries(0):
+            get_categories()
+
+
+class FragmentCacheTests(TestCase):
+    """Fragments {% versioned_cache %} de l'accueil : servis du cache, invalidés par save()."""
+
+    def setUp(self):
+        site_cache.clear()
+        caches[settings.FRAGMENT_CACHE_ALIAS].clear()
+
+    def test_home_fragments_follow_saves(self):
+        category = Category.objects.create(name="Soins", slug="soins")
+        objects = [
+            HeroSlide.objects.create(title="Slide hiver", image='hero_slides/slide.jpg'),
+            Service.objects.create(title="Pose hiver", icon="fas fa-tools", description="...", details="a",
+                                   whatsapp_link="https://wa.me/0"),
+            Product.objects.create(name="Savon hiver", slug="savon", description="...", price=Decimal('100'),
+                                   image='products/test.jpg', category=category, is_featured=True),
+        ]
+        field = {HeroSlide: 'title', Service: 'title', Product: 'name'}
+        for obj in objects:
+            self.assertContains(self.client.get(reverse('home')), getattr(obj, field[type(obj)]))
+
+        for obj in objects:
+            name = field[type(obj)]
+            old, new = getattr(obj, name), getattr(obj, name).replace("hiver", "été")
+            # UPDATE sans signal : le fragment en cache est encore servi
+            type(obj).objects.filter(pk=obj.pk).update(**{name: new})
+            self.assertContains(self.client.get(reverse('home')), old)
+            setattr(obj, name, new)
+            obj.save()
+            response = self.client.get(reverse('home'))
+            self.assertContains(response, new)
+            self.assertNotContains(response, old)
+
+
+class KeysetPaginationTests(TestCase):
+    """Pagination par curseur (core/pagination.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Savons")
+        Product.objects.bulk_create([
+            Product(
+                name=f"Savon {n}", slug=f"savon-{n}", description="...", price=Decimal('1000'),
+                image='products/test.jpg', category=category,
+            )
+            for n in range(7)
+        ])
+        # Produits importés en masse : même date de création pour plusieurs lignes
+        cls.created_at = timezone.now()
+        Product.objects.update(created_at=cls.created_at)
+        Product.objects.filter(slug='savon-6').update(created_at=cls.created_at - timedelta(days=1))
+
+    def test_cursor_round_trip(self):
+        product = Product.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(product)), (product.created_at, product.pk))
+
+    def test_tampered_cursor_returns_first_page(self):
+        tampered = encode_cursor(Product.objects.first())[:-3] + '!!!'
+        created_at = Product.objects.first().created_at.isoformat()
+        oversized = base64.urlsafe_b64encode(f"{created_at}|{2 ** 64}".encode()).decode()
+        for cursor in [tampered, 'abc', base64.urlsafe_b64encode(b'hier|x').decode(), oversized]:
+            self.assertIsNone(decode_cursor(cursor))
+        self.assertEqual(self.client.get(reverse('shop'), {'cursor': oversized}).status_code, 200)
+        page = keyset_page(Product.objects.all(), 'abc', 3)
+        self.assertFalse(page.has_previous())
+        self.assertEqual(list(page), list(Product.objects.order_by('-created_at', '-pk')[:3]))
+
+    def test_equal_created_at_is_broken_by_pk(self):
+        expected = list(Product.objects.order_by('-created_at', '-pk').values_list('slug', flat=True))
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Product.objects.all(), cursor, 3)
+            seen += [product.slug for product in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        # Aucun produit sauté ni répété entre les pages
+        self.assertEqual(seen, expected)
+        self.assertEqual(seen[:2], ['savon-5', 'savon-4'])
+        self.assertEqual(seen[-1], 'savon-6')
+
+    def test_similar_products_include_same_timestamp(self):
+        older, newer = similar_querysets(Product.objects.get(slug='savon-3'))
+        self.assertEqual([p.slug for p in older], ['savon-2', 'savon-1', 'savon-0', 'savon-6'])
+        self.assertEqual([p.slug for p in newer], ['savon-4', 'savon-5'])
+
+
+class SearchTests(TestCase):
+    """Index de la boutique, recherche et facettes (core/search.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        soins = Category.objects.create(name="Soins", slug="soins")
+        tisanes = Category.objects.create(name="Tisanes", slug="tisanes")
+        for name, category, price in [
+            ("Savon noir", soins, '2500'),
+            ("Beurre de karité", soins, '10000'),
+            ("Tisane moringa", tisanes, '9999.99'),
+            ("Tisane kinkéliba", tisanes, '30000'),
+        ]:
+            Product.objects.create(
+                name=name, description="<p>Naturel</p>", price=Decimal(price),
+                image='products/test.jpg', category=category, stock=1,
+            )
+
+    def setUp(self):
+        site_cache.clear()
+
+    def listed(self, **params):
+        response = self.client.get(reverse('shop'), params)
+        return sorted(product.name for product in response.context['products'])
+
+    def test_search_by_prefix(self):
+        entries = ProductIndex.objects.filter(is_active=True)
+        found = search.search(entries, "tis mor").values_list('product__name', flat=True)
+        self.assertEqual(list(found), ["Tisane moringa"])
+        self.assertEqual(search.search(entries, "naturel").count(), 4)
+        self.assertEqual(search.search(entries, "  ").count(), 4)
+
+    def test_upsert_keeps_one_entry_per_product(self):
+        product = Product.objects.get(name="Savon noir")
+        product.name = "Savon au miel"
+        product.price = Decimal('6000')
+        product.save()
+        search.index_products([product])
+        self.assertEqual(ProductIndex.objects.count(), 4)
+        entry = ProductIndex.objects.get(product=product)
+        self.assertEqual((entry.price, entry.price_bucket), (Decimal('6000'), 1))
+        self.assertEqual(list(search.search(ProductIndex.objects.all(), "miel")), [entry])
+
+    def test_facet_counts(self):
+        entries = ProductIndex.objects.filter(is_active=True)
+        categories, buckets = search.facet_counts(entries)
+        self.assertEqual(categories, {'soins': 2, 'tisanes': 2})
+        self.assertEqual(buckets, {0: 1, 1: 1, 2: 1, 3: 1})
+        # Tranches limitées aux catégories choisies, catégories toujours complètes
+        categories, buckets = search.facet_counts(entries, ['tisanes'])
+        self.assertEqual(categories, {'soins': 2, 'tisanes': 2})
+        self.assertEqual(buckets, {1: 1, 3: 1})
+
+    def test_price_on_a_bound_is_listed_under_one_range(self):
+        # 10 000 F ouvre la tranche 10 000 – 25 000 et n'appartient pas à 5 000 – 10 000
+        self.assertEqual(self.listed(price_min='5000', price_max='10000'), ["Tisane moringa"])
+        self.assertEqual(self.listed(price_min='10000', price_max='25000'), ["Beurre de karité"])
+        ranges = self.client.get(reverse('shop')).context['price_ranges']
+        self.assertEqual([r['count'] for r in ranges[:3]], [1, 1, 1])
+
+    def test_non_finite_prices_are_ignored(self):
+        for value in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            self.assertIsNone(search.parse_price(value))
+        self.assertEqual(len(self.listed(price_min='NaN', price_max='Infinity')), 4)
+
+    def test_failed_rebuild_keeps_previous_index(self):
+        with mock.patch.object(search, 'index_products', side_effect=OperationalError("disk I/O error")):
+            with self.assertRaises(OperationalError):
+                search.rebuild_index()
+        self.assertEqual(ProductIndex.objects.count(), 4)
+        self.assertEqual(search.rebuild_index(), 4)
+
+
+class RatingTests(TestCase):
+    """Note dénormalisée des produits (rating_avg / rating_count) et with_ratings()."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Soins", slug="soins")
+        cls.product = Product.objects.create(
+            name="Savon noir", slug="savon-noir", description="...", price=Decimal('2500'),
+            image='products/test.jpg', category=category, stock=1,
+        )
+
+    def rating(self):
+        self.product.refresh_from_db()
+        return self.product.rating_avg, self.product.rating_count
+
+    def test_approval_changes_rating(self):
+        review = Review.objects.create(product=self.product, name="Awa", rating=4)
+        Review.objects.create(product=self.product, name="Koffi", rating=5, is_approved=True)
+        self.assertEqual(self.rating(), (Decimal('5.00'), 1))
+
+        review.is_approved = True
+        review.save()
+        self.assertEqual(self.rating(), (Decimal('4.50'), 2))
+
+        review.is_approved = False
+        review.save()
+        self.assertEqual(self.rating(), (Decimal('5.00'), 1))
+
+    def test_deleted_review_leaves_rating(self):
+        review = Review.objects.create(product=self.product, name="Awa", rating=2, is_approved=True)
+        self.assertEqual(self.rating(), (Decimal('2.00'), 1))
+        review.delete()
+        self.assertEqual(self.rating(), (Decimal('0.00'), 0))
+
+    def test_with_ratings_counts_approved_reviews_only(self):
+        Review.objects.bulk_create([
+            Review(product=self.product, name="Awa", rating=3, is_approved=True),
+            Review(product=self.product, name="Koffi", rating=4, is_approved=True),
+            Review(product=self.product, name="Spam", rating=1),
+        ])
+        with self.assertNumQueries(1):
+            product = Product.objects.with_ratings().get(pk=self.product.pk)
+        self.assertEqual((product.review_avg, product.review_count), (3.5, 2))
+        # bulk_create n'émet pas de signal : refresh_ratings() recopie ces valeurs
+        self.assertEqual(self.rating(), (Decimal('0.00'), 0))
+        Product.objects.filter(pk=self.product.pk).refresh_ratings()
+        self.assertEqual(self.rating(), (Decimal('3.50'), 2))
+
+
+class DatabaseTests(SimpleTestCase):
+    """Relance des écritures (core/db.py) et routage des lectures (core/routers.py)."""
+
+    databases = {'default'}
+
+    def locked_then(self, failures, result='ok'):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError("database is locked")
+            return result
+        return write, calls
+
+    def test_retry_then_succeed(self):
+        write, calls = self.locked_then(2)
+        with mock.patch('core.db.time.sleep') as sleep:
+            self.assertEqual(retry_on_locked(write)(), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.05, 0.1])
+
+    def test_give_up_after_attempts(self):
+        write, calls = self.locked_then(10)
+        with mock.patch('core.db.time.sleep'), self.assertRaises(OperationalError):
+            retry_on_locked(attempts=3)(write)()
+        self.assertEqual(len(calls), 3)
+
+    def test_no_retry_for_other_errors_or_inside_a_transaction(self):
+        def broken():
+            calls.append(1)
+            raise OperationalError("no such table: core_product")
+        calls = []
+        with self.assertRaises(OperationalError):
+            retry_on_locked(broken)()
+        self.assertEqual(len(calls), 1)
+
+        write, calls = self.locked_then(1)
+        with transaction.atomic(), self.assertRaises(OperationalError):
+            retry_on_locked(write)()
+        self.assertEqual(len(calls), 1)
+
+    def load_settings(self, profile):
+        environ = {key: value for key, value in os.environ.items() if key != 'HERBAL_DB_PROFILE'}
+        if profile:
+            environ['HERBAL_DB_PROFILE'] = profile
+        with mock.patch.dict(os.environ, environ, clear=True):
+            return runpy.run_path(str(Path(settings.BASE_DIR, 'herbal', 'settings.py')))
+
+    def test_reader_alias_only_in_production_profile(self):
+        default = self.load_settings(None)
+        self.assertNotIn('reader', default['DATABASES'])
+        self.assertNotIn('DATABASE_ROUTERS', default)
+
+        production = self.load_settings('production')
+        self.assertEqual(production['DATABASE_ROUTERS'], ['core.routers.ReadOnlyRouter'])
+        self.assertIn('mode=ro', production['DATABASES']['reader']['NAME'])
+
+    def test_router_sends_reads_to_reader_outside_transactions(self):
+        router = ReadOnlyRouter()
+        self.assertEqual(router.db_for_read(Product), 'reader')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        with transaction.atomic():
+            # Lectures dans une transaction : elles doivent voir ses écritures
+            self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertFalse(router.allow_migrate('reader', 'core'))
+
+
+def _reload_urlconf():
+    importlib.reload(core_urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+class AsyncCatalogueMixin:
+    """Sert les vues asynchrones du catalogue (core/async_views.py), comme avec HERBAL_ASYNC_VIEWS=1."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Nettoyages en ordre inverse : les URL sont rechargées une fois le réglage rétabli
+        cls.addClassCleanup(_reload_urlconf)
+        cls.enterClassContext(override_settings(ASYNC_CATALOGUE_VIEWS=True))
+        _reload_urlconf()
+        super().setUpClass()
+
+
+class AsyncViewPerformanceTests(AsyncCatalogueMixin, ViewPerformanceTests):
+    """Mêmes budgets de requêtes et de temps pour les vues asynchrones."""
+
+    def test_catalogue_views_are_async(self):
+        for url in [reverse('home'), reverse('shop'), reverse('product_detail', args=[self.product.slug])]:
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+
+
+class AsyncCatalogueTests(AsyncCatalogueMixin, TestCase):
+    """Réponses des vues asynchrones, servies comme sous ASGI (AsyncClient)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tisanes", slug="tisanes")
+        Product.objects.bulk_create([
+            Product(
+                name=f"Tisane {n}", slug=f"tisane-{n}", description="...", price=Decimal(1000 * (n + 1)),
+                image='products/test.jpg', category=category, stock=1, is_featured=n < 2,
+            )
+            for n in range(5)
+        ])
+        search.rebuild_index()
+        SlugRedirect.objects.create(old_slug='ancienne-tisane', product=Product.objects.get(slug='tisane-0'))
+
+    def setUp(self):
+        site_cache.clear()
+
+    async def test_home(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertContains(response, "Tisane 1")
+        self.assertEqual([p.slug for p in response.context['best_sellers']], ['tisane-1', 'tisane-0'])
+
+    async def test_product_detail(self):
+        response = await self.async_client.get(reverse('product_detail', args=['tisane-2']))
+        self.assertContains(response, "Tisane 2")
+        self.assertEqual(
+            [p.slug for p in response.context['similar_products']], ['tisane-1', 'tisane-0', 'tisane-3', 'tisane-4'],
+        )
+        response = await self.async_client.get(reverse('product_detail', args=['ancienne-tisane']))
+        self.assertRedirects(response, reverse('product_detail', args=['tisane-0']), status_code=301,
+                             fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('product_detail', args=['inconnue']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_product_detail_revalidation(self):
+        url = reverse('product_detail', args=['tisane-2'])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_shop_filters_and_cursor(self):
+        response = await self.async_client.get(reverse('shop'), {'price_min': '2000', 'price_max': '4000'})
+        self.assertEqual([p.slug for p in response.context['products']], ['tisane-2', 'tisane-1'])
+        with override_settings(SHOP_PAGE_SIZE=2):
+            first = await self.async_client.get(reverse('shop'), {'q': 'tisane'})
+            cursor = encode_cursor(first.context['products'][-1])
+            response = await self.async_client.get(reverse('shop'), {'q': 'tisane', 'cursor': cursor})
+        self.assertEqual([p.slug for p in response.context['products']], ['tisane-2', 'tisane-1'])
+        self.assertEqual(response.context['categories'][0]['count'], 5)
+
+
+class StaticExportTests(TestCase):
+    """Pages rendues pour `manage.py export_static`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tisanes", slug="tisanes")
+        cls.product = Product.objects.create(
+            name="Moringa", slug="moringa", description="...", price=Decimal('5000'),
+            image='products/test.jpg', category=category, stock=2,
+        )
+
+    def setUp(self):
+        site_cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_exported_form_has_no_frozen_token(self):
+        url = reverse('product_detail', args=[self.product.slug])
+        response = self.client.get(url, headers={'x-static-export': '1'})
+        self.assertContains(response, f'value="" data-csrf-url="{reverse("csrf_token")}"')
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertContains(self.client.get(url), 'name="csrfmiddlewaretoken" value="')
+
+    def test_visitor_of_static_page_gets_token_on_submit(self):
+        # Visiteur servi par le serveur de fichiers : aucun cookie csrftoken
+        add = reverse('cart_add', args=[self.product.pk])
+        self.assertEqual(self.client.post(add, {'quantity': 1}).status_code, 403)
+        response = self.client.get(reverse('csrf_token'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        token = response.json()['token']
+        response = self.client.post(add, {'quantity': 1, 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 1)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / Last-Modified des pages du catalogue (core/conditional.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Peinture", slug="peinture")
+        cls.product = Product.objects.create(
+            name="Pot", slug="pot", description="...", price=Decimal('8000'),
+            image='products/pot.jpg', category=cls.category, stock=2,
+        )
+
+    def setUp(self):
+        site_cache.clear()
+
+    def test_revalidation_returns_304_until_catalogue_changes(self):
+        url = reverse('product_detail', args=[self.product.slug])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.product.price = Decimal('9000')
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cart_changes_etag_and_drops_last_modified(self):
+        url = reverse('shop')
+        etag = self.client.get(url)['ETag']
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        self.client.get(reverse('contact'))  # affiche (et consomme) le message "ajouté au panier"
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_pending_messages_disable_validation(self):
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('ETag', response)
+
+
+class ImageTests(TestCase):
+    """Déclinaisons et optimisation des images (core/images.py, optimize_media)."""
+
+    def test_derivatives_of_same_stem_do_not_collide(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            Path(media_root, 'products').mkdir()
+            Image.new('RGB', (600, 400), 'red').save(Path(media_root, 'products', 'savon.png'))
+            Image.new('RGB', (600, 400), 'blue').save(Path(media_root, 'products', 'savon.jpg'))
+            for name in ('products/savon.png', 'products/savon.jpg'):
+                images.generate(name, ['card'], force=True)
+
+            png = Image.open(Path(media_root, images.derivative_name('products/savon.png', 480, 'jpg')))
+            jpg = Image.open(Path(media_root, images.derivative_name('products/savon.jpg', 480, 'jpg')))
+            self.assertGreater(png.getpixel((10, 10))[0], 200)
+            self.assertGreater(jpg.getpixel((10, 10))[2], 200)
+
+
+    def test_optimize_media_merges_duplicates_and_keeps_orientation(self):
+        category = Category.objects.create(name="Savons")
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            root = Path(media_root)
+            for folder in ('products', settings.CKEDITOR_UPLOAD_PATH):
+                (root / folder).mkdir()
+            photo = Image.effect_noise((120, 80), 40).convert('RGB')
+            for name in ('products/savon.jpg', 'products/savon_x7Gh2.jpg', 'uploads/salon.jpg', 'uploads/salon-2.jpg'):
+                photo.save(root / name, quality=100)
+            # Photo d'appareil : pixels en paysage, affichée en portrait (orientation 6)
+            exif = Image.Exif()
+            exif[0x0112] = 6
+            photo.save(root / 'products/portrait.jpg', quality=100, exif=exif)
+            product = Product.objects.create(
+                name="Savon", description='<img src="/media/uploads/salon-2.jpg">', price=Decimal('1000'),
+                image='products/savon_x7Gh2.jpg', category=category,
+            )
+
+            call_command('optimize_media', workers=1, stdout=StringIO(), stderr=StringIO())
+
+            product.refresh_from_db()
+            self.assertEqual(product.image.name, 'products/savon.jpg')
+            self.assertFalse((root / 'products/savon_x7Gh2.jpg').exists())
+            # Images de l'éditeur jamais fusionnées, même identiques
+            self.assertTrue((root / 'uploads/salon.jpg').exists())
+            self.assertTrue((root / 'uploads/salon-2.jpg').exists())
+            with Image.open(root / 'products/portrait.jpg') as portrait:
+                self.assertEqual(portrait.size, (80, 120))
+                self.assertNotIn(0x0112, portrait.getexif())
+
+
+class RichTextTests(TestCase):
+    """Nettoyage et optimisation des descriptions (core/richtext.py)."""
+
+    def test_sanitizes_markup(self):
+        html = render_rich_text(
+            '<p onclick="x()">Bonjour <script>alert(1)</script><b>à tous</b>'
+            '<a href="javascript:alert(1)" target="_blank">lien</a><iframe src="//x"></iframe>'
+        )
+        self.assertEqual(
+            html,
+            '<p>Bonjour <b>à tous</b><a target="_blank" rel="noopener noreferrer">lien</a></p>',
+        )
+
+    def test_self_closing_dropped_tag_keeps_following_content(self):
+        self.assertEqual(
+            render_rich_text('<p>a<svg/>b<script src="//x"/></p><p>suite</p>'),
+            '<p>ab</p><p>suite</p>',
+        )
+
+    def test_images_are_lazy_and_use_derivatives(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            upload = Path(media_root, settings.CKEDITOR_UPLOAD_PATH, 'photo.jpg')
+            upload.parent.mkdir(parents=True)
+            Image.new('RGB', (1600, 900), 'white').save(upload)
+
+            html = render_rich_text(f'<img src="/media/{settings.CKEDITOR_UPLOAD_PATH}photo.jpg" alt="Salon">')
+        self.assertIn('src="/media/derivatives/uploads/photo.jpg-800w.jpg"', html)
+        self.assertIn('photo.jpg-480w.webp 480w', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_product_save_renders_description(self):
+        category = Category.objects.create(name="Bois", slug="bois")
+        product = Product.objects.create(
+            name="Table", slug="table", description="<p>Chêne<script>x</script></p>",
+            price=Decimal('50000'), image='products/table.jpg', category=category,
+        )
+        self.assertEqual(product.description_html, '<p>Chêne</p>')
+
+        product.description = "<p>Noyer</p>"
+        product.save(update_fields=['description'])
+        product.refresh_from_db()
+        self.assertEqual(product.description_html, '<p>Noyer</p>')
+
+
+@override_settings(
+    CONTACT_INTAKE_EAGER=True, CONTACT_RATE_LIMIT=(2, 600),
+    ADMINS=[('Admin', 'admin@example.com')],
+)
+class ContactIntakeTests(TestCase):
+    """Réception des messages de contact (core/intake.py)."""
+
+    data = {'name': "Client", 'email': "client@example.com", 'subject': "Devis", 'message': "Bonjour"}
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def post(self, data=None, **extra):
+        return self.client.post(reverse('contact'), data or self.data, **extra)
+
+    def test_rate_limit_per_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.post().status_code, 302)
+        self.assertEqual(self.post().status_code, 429)
+        self.assertEqual(Contact.objects.count(), 2)
+
+    def test_invalid_forms_do_not_use_the_quota(self):
+        for _ in range(3):
+            self.assertEqual(self.post({**self.data, 'email': "invalide"}).status_code, 200)
+        self.assertEqual(self.post().status_code, 302)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_rate_limit_uses_client_ip_behind_proxy(self):
+        for _ in range(2):
+            self.post(HTTP_X_FORWARDED_FOR="203.0.113.7")
+        # Autre client derrière le même proxy : quota distinct
+        self.assertEqual(self.post(HTTP_X_FORWARDED_FOR="198.51.100.2").status_code, 302)
+        # Une entrée ajoutée par le client lui-même ne change pas son adresse
+        self.assertEqual(self.post(HTTP_X_FORWARDED_FOR="10.0.0.1, 203.0.113.7").status_code, 429)
+
+    @override_settings(CONTACT_INTAKE_EAGER=False, CONTACT_FLUSH_INTERVAL=0)
+    def test_message_is_saved_before_response_and_notified_in_one_batch(self):
+        with mock.patch.object(intake, '_ensure_worker'):
+            for n in range(3):
+                self.post({**self.data, 'name': f"Client {n}"}, REMOTE_ADDR=f"192.0.2.{n}")
+        # Enregistrés pendant la requête : seules les notifications attendent
+        self.assertEqual(Contact.objects.count(), 3)
+        self.assertEqual(len(mail.outbox), 0)
+        intake._notify(intake._drain())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("3 nouveau(x) message(s)", mail.outbox[0].subject)
+
+
+class OrderTests(TestCase):
+    """Commandes et réservations de stock (core/orders.py)."""
+
+    address = {
+        'first_name': "Awa", 'last_name': "Koné", 'email': "awa@example.com", 'address': "Rue 12",
+        'city': "Cotonou", 'zip_code': "229", 'country': "BJ", 'shipping_method': 'express',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tisanes", slug="tisanes")
+        cls.moringa = Product.objects.create(
+            name="Moringa", slug="moringa", description="...", price=Decimal('5000'),
+            image='products/test.jpg', category=category, stock=2,
+        )
+        cls.ginger = Product.objects.create(
+            name="Gingembre", slug="gingembre", description="...", price=Decimal('3000'),
+            image='products/test.jpg', category=category, stock=5,
+        )
+
+    def order(self, *lines):
+        return orders.place_order(
+            Order(**self.address),
+            [CartLine(product, quantity, product.price) for product, quantity in lines],
+        )
+
+    def test_checkout_places_order_and_reserves_stock(self):
+        self.client.post(reverse('cart_add', args=[self.moringa.pk]), {'quantity': 2})
+        response = self.client.post(reverse('checkout'), self.address)
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse('order_detail', args=[order.reference]))
+        self.assertEqual(order.total, Decimal('10000') + settings.ORDER_SHIPPING_COSTS['express'])
+        self.assertEqual(order.items.get().quantity, 2)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        self.moringa.refresh_from_db()
+        self.assertEqual(self.moringa.stock, 0)
+        self.assertFalse(ProductIndex.objects.get(product=self.moringa).in_stock)
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 0)
+
+    def test_cart_total_follows_price_change(self):
+        self.client.post(reverse('cart_add', args=[self.ginger.pk]), {'quantity': 2})
+        self.ginger.price = Decimal('3500')
+        self.ginger.save()
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['cart_items'][0].total_price, Decimal('7000'))
+        self.assertEqual(response.context['cart_total_price'], Decimal('7000'))
+        # Résumé de l'en-tête remis à jour par le chargement des lignes
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['total'], '7000.00')
+
+    def test_login_merges_session_cart(self):
+        user = User.objects.create_user('awa', 'awa@example.com', 'secret')
+        Cart.objects.create(user=user).items.create(product=self.ginger, quantity=1)
+        self.client.post(reverse('cart_add', args=[self.ginger.pk]), {'quantity': 2})
+        self.client.post(reverse('cart_add', args=[self.moringa.pk]))
+        self.client.login(username='awa', password='secret')
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart__user=user).values_list('product__slug', 'quantity')),
+            {'gingembre': 3, 'moringa': 1},
+        )
+        self.assertNotIn('cart', self.client.session)
+        self.assertNotIn('cart_summary', self.client.session)
+        self.assertEqual(self.client.get(reverse('cart_summary')).json()['count'], 4)
+
+    def test_database_cart_page_queries_do_not_grow_with_lines(self):
+        user = User.objects.create_user('awa', 'awa@example.com', 'secret')
+        self.client.force_login(user)
+        self.client.post(reverse('cart_add', args=[self.ginger.pk]))
+        with CaptureQueriesContext(connection) as one_line:
+            self.client.get(reverse('cart'))
+        category = self.ginger.category
+        for n in range(5):
+            product = Product.objects.create(
+                name=f"Tisane {n}", description="...", price=Decimal('1000'),
+                image='products/test.jpg', category=category, stock=5,
+            )
+            self.client.post(reverse('cart_add', args=[product.pk]))
+        with CaptureQueriesContext(connection) as six_lines:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(response.context['cart_items']), 6)
+        self.assertEqual(response.context['cart_total_price'], Decimal('8000'))
+        self.assertEqual(len(six_lines), len(one_line))
+        # Session, utilisateur, lignes du panier (avec produits et catégories)
+        self.assertLessEqual(len(six_lines), 3)
+
+    def test_last_units_cannot_be_sold_twice(self):
+        self.order((self.moringa, 2))
+        with self.assertRaises(orders.OutOfStock):
+            self.order((self.ginger, 1), (self.moringa, 1))
+        # Toute la commande est annulée, y compris les lignes déjà décrémentées
+        self.ginger.refresh_from_db()
+        self.assertEqual(self.ginger.stock, 5)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_checkout_out_of_stock_returns_to_cart(self):
+        self.client.post(reverse('cart_add', args=[self.moringa.pk]), {'quantity': 3})
+        response = self.client.post(reverse('checkout'), self.address)
+        self.assertRedirects(response, reverse('cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertContains(self.client.get(reverse('cart')), "plus disponible")
+
+    def test_expired_reservations_are_released(self):
+        order = self.order((self.moringa, 2), (self.ginger, 1))
+        self.assertEqual(orders.release_expired(), 0)
+        Order.objects.filter(pk=order.pk).update(expires_at=timezone.now())
+        self.assertEqual(orders.release_expired(), 1)
+        self.assertEqual(orders.release_expired(), 0)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.EXPIRED)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(
+            dict(Product.objects.values_list('slug', 'stock')), {'moringa': 2, 'gingembre': 5},
+        )
+        self.assertTrue(ProductIndex.objects.get(product=self.moringa).in_stock)
+
+    def test_cancel_releases_only_the_cancelled_orders(self):
+        first, second = self.order((self.ginger, 1)), self.order((self.ginger, 2))
+        # Réservation orpheline d'une commande déjà annulée : hors de portée
+        Order.objects.filter(pk=first.pk).update(status=Order.CANCELLED)
+        self.assertEqual(orders.cancel_orders([second.pk]), 1)
+        self.ginger.refresh_from_db()
+        self.assertEqual(self.ginger.stock, 4)
+        self.assertEqual(list(StockReservation.objects.values_list('order', flat=True)), [first.pk])
+
+    def test_deleting_pending_order_releases_stock(self):
+        order = self.order((self.ginger, 2))
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:core_order_changelist'), {
+            'action': 'delete_selected', '_selected_action': [order.pk], 'post': 'yes',
+        })
+        self.assertFalse(Order.objects.exists())
+        self.ginger.refresh_from_db()
+        self.assertEqual(self.ginger.stock, 5)
+        self.assertTrue(ProductIndex.objects.get(product=self.ginger).in_stock)
+
+    def test_order_page_is_private_to_its_session(self):
+        self.client.post(reverse('cart_add', args=[self.moringa.pk]))
+        self.client.post(reverse('checkout'), self.address)
+        url = reverse('order_detail', args=[Order.objects.get().reference])
+        self.assertContains(self.client.get(url), "Rue 12")
+        # Aucune confirmation de paiement publique
+        self.assertEqual(self.client.post(url).status_code, 405)
+        self.assertEqual(Order.objects.get().status, Order.PENDING)
+        # Autre visiteur muni de la référence
+        self.assertEqual(Client().get(url).status_code, 404)
+
+    def test_payment_is_confirmed_from_admin(self):
+        order = self.order((self.moringa, 1))
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:core_order_changelist'), {
+            'action': 'confirm_payments', '_selected_action': [order.pk],
+        })
+        self.assertFalse(orders.confirm_payment(order))
+        Order.objects.filter(pk=order.pk).update(expires_at=timezone.now())
+        self.assertEqual(orders.release_expired(), 0)
+        self.moringa.refresh_from_db()
+        self.assertEqual(self.moringa.stock, 1)
+        self.assertEqual(Order.objects.get().status, Order.PAID)
+
+
+class SessionTests(TestCase):
+    """Expiration glissante des sessions (core/middleware.py) : la lecture n'écrit rien."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tisanes", slug="tisanes")
+        cls.product = Product.objects.create(
+            name="Moringa", slug="moringa", description="...", price=Decimal('5000'),
+            image='products/test.jpg', category=category, stock=2,
+        )
+
+    def session_writes(self, *urls):
+        with CaptureQueriesContext(connection) as queries:
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if 'django_session' in query['sql'] and not query['sql'].lstrip().upper().startswith('SELECT')
+        ]
+
+    def test_read_only_browsing_writes_no_session(self):
+        pages = [reverse('home'), reverse('shop'), reverse('product_detail', args=['moringa']), reverse('cart')]
+        self.assertEqual(self.session_writes(*pages), [])
+        # Session créée par le panier : déjà horodatée, la navigation suivante n'écrit rien
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        self.assertEqual(self.session_writes(*pages), [])
+
+    def test_session_is_refreshed_after_interval(self):
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        session = self.client.session
+        session['_refreshed_at'] -= settings.SESSION_REFRESH_INTERVAL
+        session.save()
+        self.assertEqual(len(self.session_writes(reverse('home'))), 1)
+        self.assertEqual(self.session_writes(reverse('home')), [])
+
+
+class CatalogueFeedTests(TestCase):
+    """Import / export en masse du catalogue (core/feeds.py)."""
+
+    rows = [
+        {'name': "Savon noir", 'category': "Soins", 'price': "2500", 'stock': 10, 'description': "<p>Doux</p>"},
+        {'name': "Savon noir", 'category': "Soins", 'price': "3000", 'stock': 4, 'image': 'products/savon.jpg'},
+        {'name': "Tisane", 'category': "Tisanes", 'price': "1500", 'is_featured': "oui", 'images': ['products/a.jpg']},
+    ]
+
+    def run_import(self, rows, batch_size=2):
+        importer = feeds.CatalogueImporter(batch_size=batch_size)
+        return importer.run(rows)
+
+    def test_import_creates_products_in_batches(self):
+        rows = [{'name': f"Produit {n}", 'category': f"Catégorie {n % 3}", 'price': "100"} for n in range(60)]
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.run_import(rows, batch_size=30)
+        self.assertEqual(stats['created'], 60)
+        # Quelques requêtes par lot, quel que soit le nombre de produits du lot
+        self.assertLessEqual(len(queries), 20)
+        self.assertEqual(ProductIndex.objects.count(), 60)
+        self.assertEqual(Category.objects.count(), 3)
+
+    def test_slug_collisions_and_resync(self):
+        stats = self.run_import(self.rows)
+        self.assertEqual(stats, {'created': 3, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(
+            list(Product.objects.order_by('slug').values_list('slug', flat=True)),
+            ['savon-noir', 'savon-noir-2', 'tisane'],
+        )
+        tisane = Product.objects.get(slug='tisane')
+        self.assertTrue(tisane.is_featured)
+        self.assertEqual(list(tisane.images.values_list('image', flat=True)), ['products/a.jpg'])
+        self.assertEqual(Product.objects.get(slug='savon-noir').description_html, "<p>Doux</p>")
+
+        # Même fichier : rien n'est réécrit ; un prix modifié met à jour une ligne et l'index
+        updated_at = tisane.updated_at
+        self.assertEqual(self.run_import(self.rows)['unchanged'], 3)
+        changed = [dict(row) for row in self.rows]
+        changed[2]['price'] = "1800"
+        self.assertEqual(self.run_import(changed), {'created': 0, 'updated': 1, 'unchanged': 2})
+        tisane.refresh_from_db()
+        self.assertGreater(tisane.updated_at, updated_at)
+        self.assertEqual(ProductIndex.objects.get(product=tisane).price, Decimal('1800'))
+
+    def test_rows_without_slug_skip_redirected_slugs(self):
+        self.run_import([{'name': "Table", 'category': "Meubles", 'price': "100"}])
+        table = Product.objects.get(slug='table')
+        table.slug = 'table-chene'
+        table.save()
+
+        rows = [{'name': "Table", 'category': "Meubles", 'price': "200"}]
+        self.assertEqual(self.run_import(rows)['created'], 1)
+        self.assertEqual(Product.objects.get(price=Decimal('200')).slug, 'table-2')
+        # Réimport : même produit, et l'ancienne URL redirige toujours
+        self.assertEqual(self.run_import(rows)['unchanged'], 1)
+        response = self.client.get(reverse('product_detail', args=['table']))
+        self.assertRedirects(response, reverse('product_detail', args=['table-chene']), status_code=301)
+
+    def test_invalid_rows_are_reported(self):
+        importer = feeds.CatalogueImporter()
+        importer.run([{'name': "Sans prix", 'category': "Soins"}, {'name': "", 'category': "Soins", 'price': "1"}])
+        self.assertEqual([number for number, _ in importer.errors], [1, 2])
+        self.assertFalse(Product.objects.exists())
+
+    def test_unreadable_lines_are_reported(self):
+        lines = StringIO(
+            '{"name": "Savon", "category": "Soins", "price": "100"}\n'
+            '{"name": "Tronqué", \n'
+            '["pas", "un", "objet"]\n'
+            '{"name": 12, "category": "Soins", "price": "1"}\n'
+            '{"name": "Tisane", "category": "Tisanes", "price": "200"}\n'
+        )
+        importer = feeds.CatalogueImporter(batch_size=1)
+        self.assertEqual(importer.run(feeds.read_rows(lines, 'jsonl'))['created'], 2)
+        self.assertEqual([number for number, _ in importer.errors], [2, 3, 4])
+        self.assertIn("JSON invalide", importer.errors[0][1])
+
+    def test_interrupted_import_still_invalidates_cache(self):
+        def rows():
+            yield {'name': "Savon", 'category': "Soins", 'price': "100"}
+            raise OSError("fichier tronqué")
+
+        version = site_cache.version(Product)
+        with self.assertRaises(OSError):
+            feeds.CatalogueImporter(batch_size=1).run(rows())
+        self.assertTrue(Product.objects.filter(slug='savon').exists())
+        self.assertGreater(site_cache.version(Product), version)
+
+    def test_replaced_archive_image_refreshes_derivatives(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            Path(media_root, 'products').mkdir()
+            Image.new('RGB', (40, 30), 'red').save(Path(media_root, 'products', 'a.jpg'))
+            images.generate('products/a.jpg', ['card'])
+            self.addCleanup(images._known.discard, ('products/a.jpg', 'card'))
+
+            buffer = BytesIO()
+            Image.new('RGB', (60, 45), 'blue').save(buffer, 'JPEG')
+            archive = Path(media_root, 'images.zip')
+            with zipfile.ZipFile(archive, 'w') as handle:
+                handle.writestr('products/a.jpg', buffer.getvalue())
+            self.assertEqual(feeds.extract_image_archive(archive), 1)
+
+            derivative = Path(media_root, images.derivative_name('products/a.jpg', 480, 'jpg'))
+            with Image.open(derivative) as image:
+                red, green, blue = image.convert('RGB').getpixel((0, 0))
+            self.assertGreater(blue, red)
+
+    def test_export_import_round_trip_with_images(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            Path(media_root, 'products').mkdir()
+            Image.new('RGB', (40, 30), 'green').save(Path(media_root, 'products', 'savon.jpg'))
+            self.run_import(self.rows)
+
+            export = Path(media_root, 'export.csv')
+            archive = Path(media_root, 'images.zip')
+            call_command('export_catalogue', str(export), images=str(archive), stderr=StringIO())
+            Product.objects.all().delete()
+            Path(media_root, 'products', 'savon.jpg').unlink()
+
+            call_command('import_catalogue', str(export), images=str(archive), stdout=StringIO())
+            self.assertEqual(Product.objects.count(), 3)
+            self.assertEqual(Product.objects.get(slug='savon-noir-2').price, Decimal('3000'))
+            self.assertTrue(Path(media_root, 'products', 'savon.jpg').exists())
+            self.assertEqual(Product.objects.get(slug='tisane').images.count(), 1)
+
+
+class SlugTests(TestCase):
+    """Attribution des slugs (core/slugs.py) et redirection des anciens slugs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Savons")
+
+    def create(self, name, **kwargs):
+        return Product.objects.create(
+            name=name, description="...", price=Decimal('1000'), image='products/test.jpg',
+            category=self.category, **kwargs,
+        )
+
+    def test_same_name_gets_next_free_slug(self):
+        self.create("Savon noir")
+        self.create("Savon noir")
+        self.create("Savon noir", slug='savon-noir-4')
+        with self.assertNumQueries(1):
+            self.assertEqual(slugs.allocate(Product, "Savon noir"), 'savon-noir-3')
+        self.assertEqual(self.create("Savon noir").slug, 'savon-noir-3')
+        self.assertEqual(self.create("Savon noir").slug, 'savon-noir-5')
+
+    def test_allocate_many(self):
+        with self.assertNumQueries(1):
+            allocated = slugs.allocate_many(Category, ["Savons", "Huiles", "huiles", "Savons"])
+        self.assertEqual(allocated, ['savons-2', 'huiles', 'huiles-2', 'savons-3'])
+
+    def test_concurrent_save_retries_allocation(self):
+        self.create("Savon")
+        # Le slug choisi est pris par un autre enregistrement avant l'insertion
+        with mock.patch.object(slugs, 'allocate', side_effect=['savon', 'savon-2']) as allocate:
+            self.assertEqual(self.create("Savon").slug, 'savon-2')
+        self.assertEqual(allocate.call_count, 2)
+
+    def test_renamed_product_redirects(self):
+        product = self.create("Savon noir")
+        product = Product.objects.get(pk=product.pk)
+        product.slug = 'savon-noir-bio'
+        product.save()
+        response = self.client.get(reverse('product_detail', args=['savon-noir']))
+        self.assertRedirects(response, reverse('product_detail', args=['savon-noir-bio']), status_code=301)
+
+        # Retour à l'ancien slug : pas de boucle de redirection
+        product.slug = 'savon-noir'
+        product.save()
+        self.assertEqual(
+            list(SlugRedirect.objects.values_list('old_slug', flat=True)), ['savon-noir-bio'],
+        )
+        self.assertEqual(self.client.get(reverse('product_detail', args=['savon-noir'])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('product_detail', args=['inconnu'])).status_code, 404)
+
+    def test_new_product_does_not_take_a_redirected_slug(self):
+        product = self.create("Savon noir")
+        product = Product.objects.get(pk=product.pk)
+        product.slug = 'savon-noir-bio'
+        product.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(slugs.allocate(Product, "Savon noir"), 'savon-noir-2')
+        self.assertEqual(slugs.allocate_many(Product, ["Savon noir"]), ['savon-noir-2'])
+        self.assertEqual(self.create("Savon noir").slug, 'savon-noir-2')
+        response = self.client.get(reverse('product_detail', args=['savon-noir']))
+        self.assertRedirects(response, reverse('product_detail', args=['savon-noir-bio']), status_code=301)
+
+
+class AdminTests(TestCase):
+    """Listes de l'admin : requêtes constantes, décompte en cache, recherche indexée."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        categories = [Category.objects.create(name=f"Catégorie {n}") for n in range(3)]
+        Product.objects.bulk_create([
+            Product(
+                name=f"Produit {n}", slug=f"produit-{n}", description="...", price=Decimal('100'),
+                image='products/test.jpg', category=categories[n % 3], stock=1,
+            )
+            for n in range(30)
+        ] + [Product(
+            name="Parquet chêne", slug="parquet-chene", description="...", price=Decimal('100'),
+            image='products/test.jpg', category=categories[0],
+        )])
+        search.rebuild_index()
+        Contact.objects.bulk_create([
+            Contact(name=f"Client {n}", email=f"client{n}@example.com", subject="Devis", message="...")
+            for n in range(30)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_product_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:core_product_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, "Produit 29")
+        # Le décompte vient du cache, les catégories du JOIN
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql'] and 'core_product' in q['sql']])
+        self.assertFalse([q for q in queries if 'FROM "core_category" WHERE "core_category"."id" =' in q['sql']])
+
+    def test_product_search_uses_index(self):
+        response = self.client.get(reverse('admin:core_product_changelist'), {'q': 'parq'})
+        self.assertContains(response, "Parquet chêne")
+        self.assertNotContains(response, "Produit 1<")
+
+    def test_contact_search(self):
+        url = reverse('admin:core_contact_changelist')
+        self.assertContains(self.client.get(url, {'q': 'client7@example.com'}), "Client 7")
+        response = self.client.get(url, {'q': 'client 1'})
+        self.assertContains(response, "Client 12")
+        self.assertNotContains(response, "Client 2<")
+
+    def test_slide_preview_is_a_thumbnail(self):
+        HeroSlide.objects.create(title="Slide", image='hero_slides/slide.jpg')
+        images._known.add(('hero_slides/slide.jpg', 'thumb'))
+        response = self.client.get(reverse('admin:core_heroslide_changelist'))
+        self.assertContains(response, 'src="/media/derivatives/hero_slides/slide.jpg-192w.jpg"')
+
+
+class BulkActionTests(TestCase):
+    """Actions de masse de l'admin : UPDATE par lots, index et versions tenus à jour."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        category = Category.objects.create(name="Savons")
+        Product.objects.bulk_create([
+            Product(
+                name=f"Savon {n}", slug=f"savon-{n}", description="...", price=Decimal('4800'),
+                image='products/test.jpg', category=category, stock=1,
+            )
+            for n in range(5)
+        ])
+        search.rebuild_index()
+        Contact.objects.bulk_create([
+            Contact(name=f"Client {n}", email=f"client{n}@example.com", subject="Devis", message="...")
+            for n in range(3)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.pks = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+
+    def post_action(self, action, pks, **data):
+        return self.client.post(reverse('admin:core_product_changelist'), {
+            'action': action, '_selected_action': pks, **data,
+        })
+
+    def test_inline_deactivate_updates_index_and_version(self):
+        version = site_cache.version(Product)
+        response = self.post_action('deactivate', self.pks[:2])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.filter(is_active=False).count(), 2)
+        self.assertEqual(ProductIndex.objects.filter(is_active=False).count(), 2)
+        self.assertGreater(site_cache.version(Product), version)
+
+    @override_settings(BULK_INLINE_LIMIT=2, BULK_CHUNK_SIZE=2, BULK_JOBS_EAGER=True)
+    def test_background_reprice_reports_progress(self):
+        response = self.post_action('reprice', self.pks, percentage='10')
+        self.assertEqual(Product.objects.filter(price=Decimal('5280')).count(), 5)
+        entry = ProductIndex.objects.get(product=self.pks[0])
+        self.assertEqual((entry.price, entry.price_bucket), (Decimal('5280'), 1))
+
+        message = next(iter(response.wsgi_request._messages))
+        job_url = message.message.split('href="')[1].split('"')[0]
+        status = self.client.get(job_url).json()
+        self.assertEqual(
+            {key: status[key] for key in ('label', 'total', 'done', 'state', 'stale')},
+            {'label': "Prix +10 %", 'total': 5, 'done': 5, 'state': 'done', 'stale': False},
+        )
+        self.assertIn('started_at', status)
+
+    @override_settings(BULK_INLINE_LIMIT=2, BULK_JOB_STALE_AFTER=60)
+    def test_job_state_is_shared_and_dead_jobs_are_stale(self):
+        # Thread jamais démarré : la tâche reste 'running' sans avancement
+        with mock.patch('core.bulk.threading.Thread'):
+            job_id = bulk.run("Activation", self.pks, bulk.set_active, [Product], True)
+        # Lu en base, sans passer par le cache du process qui l'a lancée
+        cache.clear()
+        status = bulk.job_status(job_id)
+        self.assertEqual((status['state'], status['done'], status['stale']), ('running', 0, False))
+
+        BulkJob.objects.filter(pk=job_id).update(updated_at=timezone.now() - timedelta(minutes=5))
+        self.assertTrue(bulk.job_status(job_id)['stale'])
+        self.assertIsNone(bulk.job_status('inconnue'))
+
+    def test_reprice_rejects_invalid_percentage(self):
+        self.post_action('reprice', self.pks, percentage='-95')
+        self.assertFalse(Product.objects.exclude(price=Decimal('4800')).exists())
+
+    def test_mark_contacts_read(self):
+        self.client.post(reverse('admin:core_contact_changelist'), {
+            'action': 'mark_read', '_selected_action': list(Contact.objects.values_list('pk', flat=True)),
+        })
+        self.assertFalse(Contact.objects.filter(is_read=False).exists())
@@ -1,15 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from django.contrib.auth import views as auth_views
 from . import views
 
+# Sous ASGI, les vues du catalogue sont servies par leurs versions asynchrones
+if settings.ASYNC_CATALOGUE_VIEWS:
+    from . import async_views as catalogue
+else:
+    catalogue = views
+
 
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
-    path('shop/', views.shop, name='shop'),
+    path('', catalogue.home, name='home'),
+    path('product/<slug:slug>/', catalogue.product_detail, name='product_detail'),
+    path('shop/', catalogue.shop, name='shop'),
+    path('shop/page/<int:page>/', catalogue.shop, name='shop_page'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
+    path('cart/', views.cart_detail, name='cart'),
+    path('cart/summary/', views.cart_summary, name='cart_summary'),
+    path('csrf/', views.csrf_token, name='csrf_token'),
+    path('cart/add/<int:product_id>/', views.cart_add, name='cart_add'),
+    path('cart/update/<int:product_id>/', views.cart_update_item, name='cart_update_item'),
+    path('cart/remove/<int:product_id>/', views.remove_cart_item, name='remove_cart_item'),
+    path('checkout/', views.checkout, name='checkout'),
+    path('order/<uuid:reference>/', views.order_detail, name='order_detail'),
       
     
 ]
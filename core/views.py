@@ -1,4 +1,4 @@
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
 # views.py
 from django.shortcuts import render, redirect
@@ -14,15 +14,28 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
-from .forms import ContactForm
+from .forms import CheckoutForm, ContactForm
+from . import intake, orders, search
+from .cache import get_categories, get_services
+from .conditional import conditional_page
+from .cart import get_cart, get_cart_summary
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST, require_safe
+from .pagination import encode_cursor, keyset_page
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
 
+@conditional_page('core.heroslide', 'core.product', 'core.category')
 def home(request):
     # Get categories (optional)
     categories = Category.objects.all()[:6]
-    services = Service.objects.filter(is_active=True)
+    services = get_services(active_only=True)
     # Get best-selling or featured products
     # Example: featured products (you can create a field 'is_best_seller')
-    best_sellers = Product.objects.filter(is_active=True, is_featured=True).order_by('-created_at')[:6]
+    best_sellers = Product.objects.for_listing().filter(is_active=True, is_featured=True).order_by('-created_at')[:6]
     hero_slides = HeroSlide.objects.filter(is_active=True)
 
     
@@ -36,46 +49,162 @@ def home(request):
 
 
 
+def similar_querysets(product):
+    """
+    Produits de la même catégorie les plus proches dans le temps : les plus
+    anciens (du plus récent au plus ancien), puis les plus récents. Chaque
+    requête est une lecture bornée de l'index (catégorie, date) : le coût ne
+    dépend pas de la taille de la catégorie. Les égalités de date (imports
+    en masse) sont départagées par l'id, comme dans keyset_page().
+    """
+    same_category = Product.objects.for_listing().filter(category_id=product.category_id, is_active=True)
+    created_at, pk = product.created_at, product.pk
+    # La borne sur la date seule garde la lecture de l'index bornée
+    return (
+        same_category.filter(created_at__lte=created_at)
+        .filter(Q(created_at__lt=created_at) | Q(pk__lt=pk)).order_by('-created_at', '-pk'),
+        same_category.filter(created_at__gte=created_at)
+        .filter(Q(created_at__gt=created_at) | Q(pk__gt=pk)).order_by('created_at', 'pk'),
+    )
+
+
+def _similar_products(product, limit=4):
+    older, newer = similar_querysets(product)
+    similar = list(older[:limit])
+    if len(similar) < limit:
+        similar += newer[:limit - len(similar)]
+    return similar
+
+
+def product_queryset():
+    """
+    Produit, catégorie et galerie ordonnée : deux requêtes au total.
+    La description brute n'est pas lue : le HTML précalculé suffit.
+    """
+    return Product.objects.select_related('category').defer('description').prefetch_related(
+        Prefetch('images', queryset=ProductImage.objects.order_by('order', 'pk'))
+    )
+
+
+@conditional_page('core.product', 'core.category', 'core.review', 'core.productimage')
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    
+    try:
+        product = product_queryset().get(slug=slug, is_active=True)
+    except Product.DoesNotExist:
+        # Produit renommé : redirection permanente vers son URL actuelle
+        new_slug = SlugRedirect.objects.current_slug(slug)
+        if new_slug is None:
+            raise Http404("Produit introuvable")
+        return redirect('product_detail', slug=new_slug, permanent=True)
+
     # Ajouter les produits similaires (même catégorie)
-    similar_products = Product.objects.filter(category=product.category, is_active=True).exclude(id=product.id)[:4]
+    similar_products = _similar_products(product)
+
+    reviews = product.reviews.filter(is_approved=True)[:10] if product.rating_count else []
 
     context = {
         'product': product,
         'similar_products': similar_products,
+        'reviews': reviews,
     }
     return render(request, 'core/product_detail.html', context)
 
 
 
-def shop(request):
-    products = Product.objects.all()
-    categories = Category.objects.all()
+def shop_filters(request):
+    """
+    Applique les filtres de la boutique (recherche, prix) à l'index.
+    Retourne le queryset d'index et les valeurs des filtres pour le template.
+    Partagé avec la vue asynchrone (core/async_views.py).
+    """
+    # Toutes les requêtes de la boutique passent par l'index dénormalisé (core.search)
+    entries = ProductIndex.objects.filter(is_active=True)
 
-    # Récupérer les catégories sélectionnées depuis GET
-    selected_categories = request.GET.getlist('category')  # ici on peut l’envoyer au template
+    # Recherche plein texte
+    query = request.GET.get('q', '').strip()
+    entries = search.search(entries, query)
 
-    # Filtrage par catégorie
-    if selected_categories:
-        products = products.filter(category__slug__in=selected_categories)
-
-    # Filtrage par prix
+    # Filtrage par prix : borne haute exclue, comme les tranches des facettes
     price_min = request.GET.get('price_min')
     price_max = request.GET.get('price_max')
-    if price_min:
-        products = products.filter(price__gte=price_min)
-    if price_max:
-        products = products.filter(price__lte=price_max)
+    if search.parse_price(price_min) is not None:
+        entries = entries.filter(price__gte=search.parse_price(price_min))
+    if search.parse_price(price_max) is not None:
+        entries = entries.filter(price__lt=search.parse_price(price_max))
 
-    context = {
-        'products': products,
-        'categories': categories,
-        'selected_categories': selected_categories,  # ✅ à utiliser dans le template
+    filters = {
+        'query': query,
+        'selected_categories': request.GET.getlist('category'),
         'price_min': price_min,
         'price_max': price_max,
     }
+    return entries, filters
+
+
+def shop_listing(entries, filters):
+    """Restreint aux catégories choisies et trie ; seules les clés de tri sont lues."""
+    if filters['selected_categories']:
+        entries = entries.filter(category_slug__in=filters['selected_categories'])
+    return entries.only('created_at').order_by('-created_at', '-pk')
+
+
+def path_pagination(filters, cursor):
+    """
+    La liste non filtrée est paginée par chemin (/shop/page/<n>/) : ses pages
+    sont des URL fixes, exportables par `manage.py export_static`.
+    """
+    return not cursor and not any(filters.values())
+
+
+def shop_context(page, page_range, cursor, next_cursor, categories, facets, filters):
+    category_counts, bucket_counts = facets
+    return {
+        'products': page,
+        'page_range': page_range,
+        'cursor_mode': bool(cursor),
+        'path_pagination': path_pagination(filters, cursor),
+        'next_cursor': next_cursor,
+        'categories': [
+            {'slug': c.slug, 'name': c.name, 'count': category_counts.get(c.slug, 0)}
+            for c in categories
+        ],
+        'price_ranges': [
+            {'min': low, 'max': high, 'count': bucket_counts.get(bucket, 0)}
+            for bucket, low, high in search.price_buckets()
+        ],
+        **filters,
+    }
+
+
+@conditional_page('core.product', 'core.category')
+def shop(request, page=None):
+    entries, filters = shop_filters(request)
+
+    # Facettes (comptées avant le filtre par catégorie)
+    facets = search.facet_counts(entries, filters['selected_categories'])
+    products = shop_listing(entries, filters)
+
+    # Pagination : numérotée par défaut, par curseur (keyset) pour les pages profondes
+    per_page = settings.SHOP_PAGE_SIZE
+    cursor = request.GET.get('cursor')
+    if cursor:
+        page = keyset_page(products, cursor, per_page)
+        page_range = []
+        next_cursor = page.next_cursor
+    else:
+        paginator = Paginator(products, per_page)
+        page = paginator.get_page(request.GET.get('page', page))
+        page_range = paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1)
+        next_cursor = None
+        if (
+            page.has_next() and page.number >= settings.SHOP_KEYSET_FROM_PAGE
+            and not path_pagination(filters, cursor)
+        ):
+            next_cursor = encode_cursor(page[-1])
+
+    page.object_list = search.hydrate(page.object_list)
+
+    context = shop_context(page, page_range, cursor, next_cursor, get_categories(), facets, filters)
     return render(request, 'core/shop.html', context)
 
 
@@ -84,20 +213,142 @@ def shop(request):
 def about(request):
     return render(request, 'core/pages/about.html')
 
-def contact(request):
+async def contact(request):
+    """
+    Vue asynchrone : le message validé est enregistré avant la réponse ; la
+    notification des administrateurs part par lots hors de la requête
+    (core/intake.py).
+    """
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Votre message a été envoyé avec succès !")
+            # Seuls les envois valides entament le plafond
+            if not await intake.allow_submission(intake.client_ip(request)):
+                form.add_error(None, "Trop de messages envoyés. Veuillez réessayer plus tard.")
+                return await sync_to_async(render)(request, 'core/contact.html', {'form': form}, status=429)
+            await intake.submit(form.save(commit=False))
+            await sync_to_async(messages.success)(request, "Votre message a été envoyé avec succès !")
             return redirect('contact')
         else:
-            messages.error(request, "Veuillez corriger les erreurs ci-dessous.")
+            await sync_to_async(messages.error)(request, "Veuillez corriger les erreurs ci-dessous.")
     else:
         form = ContactForm()
 
     context = {
         'form': form
     }
-    return render(request, 'core/contact.html',context)
+    # Les context processors et la session restent synchrones
+    return await sync_to_async(render)(request, 'core/contact.html', context)
+
+
+# ------------------------
+# PANIER
+# ------------------------
+
+def _quantity(request, default=1):
+    try:
+        return max(1, int(request.POST.get('quantity', default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def cart_detail(request):
+    cart = get_cart(request)
+    context = {
+        'cart_items': cart.lines,
+        'cart_total_items': cart.total_items,
+        'cart_total_price': cart.total_price,
+    }
+    return render(request, 'core/cart.html', context)
+
+
+@never_cache
+def csrf_token(request):
+    """
+    Jeton CSRF (et cookie csrftoken) pour les formulaires des pages exportées
+    en statique, qui ne peuvent pas embarquer de jeton.
+    """
+    return JsonResponse({'token': get_token(request)})
+
+
+def cart_summary(request):
+    """Résumé du panier en JSON (badge et mini-panier), sans charger de produit."""
+    summary = get_cart_summary(request)
+    return JsonResponse({'count': summary['count'], 'total': str(summary['total'])})
+
+
+@require_POST
+def cart_add(request, product_id):
+    product = get_object_or_404(Product, pk=product_id, is_active=True)
+    get_cart(request).add(product, _quantity(request))
+    messages.success(request, f"{product.name} a été ajouté au panier.")
+    return redirect('cart')
+
+
+@require_POST
+def cart_update_item(request, product_id):
+    get_cart(request).update(product_id, _quantity(request))
+    return redirect('cart')
+
+
+@require_POST
+def remove_cart_item(request, product_id):
+    get_cart(request).remove(product_id)
+    return redirect('cart')
+
+
+def checkout(request):
+    cart = get_cart(request)
+    if not cart.total_items:
+        return redirect('cart')
+    form = CheckoutForm(request.POST or None)
+    if request.method == 'POST':
+        if form.is_valid():
+            order = form.save(commit=False)
+            if request.user.is_authenticated:
+                order.user = request.user
+            try:
+                orders.place_order(order, cart.lines)
+            except orders.OutOfStock as exc:
+                messages.error(request, f"{exc.product.name} n'est plus disponible dans la quantité demandée.")
+                return redirect('cart')
+            cart.clear()
+            _remember_order(request, order)
+            return redirect('order_detail', reference=order.reference)
+        messages.error(request, "Veuillez corriger les erreurs ci-dessous.")
+    context = {
+        'form': form,
+        'shipping_costs': settings.ORDER_SHIPPING_COSTS,
+        'cart_items': cart.lines,
+        'cart_total_items': cart.total_items,
+        'cart_total_price': cart.total_price,
+    }
+    return render(request, 'core/checkout.html', context)
 
+
+# Références des commandes passées depuis la session (les plus récentes)
+ORDERS_SESSION_KEY = 'orders'
+ORDERS_SESSION_LIMIT = 20
+
+
+def _remember_order(request, order):
+    references = request.session.get(ORDERS_SESSION_KEY, [])
+    request.session[ORDERS_SESSION_KEY] = [str(order.reference), *references][:ORDERS_SESSION_LIMIT]
+
+
+@require_safe
+def order_detail(request, reference):
+    """
+    Récapitulatif d'une commande, visible seulement de la session qui l'a
+    passée ou de son client connecté : 404 pour tout autre visiteur, même
+    muni de la référence. Le paiement est confirmé depuis l'admin.
+    """
+    order = get_object_or_404(Order, reference=reference)
+    owner = request.user.is_authenticated and order.user_id == request.user.pk
+    if not owner and str(order.reference) not in request.session.get(ORDERS_SESSION_KEY, []):
+        raise Http404("Commande introuvable")
+    context = {
+        'order': order,
+        'items': order.items.all(),
+    }
+    return render(request, 'core/order_detail.html', context)
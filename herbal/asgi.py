@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'herbal.settings')
+# Les vues asynchrones du catalogue (core/async_views.py) ne sont servies
+# qu'avec HERBAL_ASYNC_VIEWS=1 : au banc (manage.py benchmark_views), les
+# vues synchrones restent plus rapides, même sous ASGI
 
 application = get_asgi_application()
@@ -1,3 +1,5 @@
+import os
+from decimal import Decimal
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -93,9 +95,19 @@ JAZZMIN_UI_TWEAKS = {
 
 CKEDITOR_UPLOAD_PATH = "uploads/"
 
+# ------------------------
+# Boutique
+# ------------------------
+SHOP_PAGE_SIZE = 24
+# À partir de cette page, le lien "suivant" passe en pagination par curseur
+SHOP_KEYSET_FROM_PAGE = 5
+# Bornes des tranches de prix (F CFA) utilisées pour les facettes
+SHOP_PRICE_BUCKETS = [5000, 10000, 25000, 50000, 100000]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -117,6 +129,8 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.services_pro',
                 'core.context_processors.site_info',
+                'core.context_processors.cart_summary',
+                'core.context_processors.static_export',
 
             ],
         },
@@ -136,6 +150,118 @@ DATABASES = {
     }
 }
 
+# Profil de production SQLite (HERBAL_DB_PROFILE=production) :
+# - WAL : les lectures ne bloquent plus derrière les écritures ;
+# - connexions persistantes et transactions IMMEDIATE avec attente (busy timeout) ;
+# - alias 'reader' en lecture seule (mode=ro), utilisé pour les lectures par
+#   core.routers.ReadOnlyRouter. Django garde une connexion par thread et par
+#   alias : chaque thread de worker dispose ainsi de sa propre connexion de lecture.
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-32768;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
+if os.environ.get('HERBAL_DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL;' + SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    })
+    DATABASES['reader'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only=1;' + SQLITE_PRAGMAS,
+            'timeout': 20,
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['core.routers.ReadOnlyRouter']
+
+
+# Cache
+# Mémoire locale par défaut ; HERBAL_CACHE=file pour partager le cache
+# (versions des modèles, fragments de templates) entre plusieurs process.
+SHARED_CACHE = os.environ.get('HERBAL_CACHE') == 'file'
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'var' / 'cache' / 'default',
+        },
+        'fragments': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'var' / 'cache' / 'fragments',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'fragments': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'fragments',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }
+
+# Plafonds d'envoi (core/intake.py) : toujours sur fichiers, pour qu'un même
+# compteur soit partagé par tous les process du serveur
+CACHES['ratelimit'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'var' / 'cache' / 'ratelimit',
+}
+
+FRAGMENT_CACHE_ALIAS = 'fragments'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Entre dans l'ETag des pages (core/conditional.py) : à changer à chaque
+# déploiement qui modifie les templates, pour invalider les caches HTTP
+PAGE_CACHE_REVISION = os.environ.get('HERBAL_REVISION', '1')
+
+# Vues asynchrones du catalogue (core/async_views.py), sous ASGI avec
+# HERBAL_ASYNC_VIEWS=1. Désactivées par défaut : plus lentes que les vues
+# synchrones au banc (manage.py benchmark_views)
+ASYNC_CATALOGUE_VIEWS = os.environ.get('HERBAL_ASYNC_VIEWS') == '1'
+
+# Messages de contact (core/intake.py) : enregistrés pendant la requête,
+# notifications aux ADMINS envoyées par lots par un thread du process
+CONTACT_INTAKE_EAGER = False
+CONTACT_BATCH_SIZE = 50
+CONTACT_FLUSH_INTERVAL = 2  # secondes d'attente pour compléter un lot
+CONTACT_RATE_LIMIT = (5, 10 * 60)  # envois par IP, fenêtre en secondes
+
+# Nombre de proxys inverses devant l'application : l'adresse du client est
+# alors lue dans X-Forwarded-For (core.intake.client_ip)
+TRUSTED_PROXY_COUNT = int(os.environ.get('HERBAL_TRUSTED_PROXIES', '0'))
+
+# Actions de masse de l'admin (core/bulk.py) : au-delà de BULK_INLINE_LIMIT lignes,
+# tâche de fond par lots de BULK_CHUNK_SIZE
+BULK_INLINE_LIMIT = 2000
+BULK_CHUNK_SIZE = 500
+BULK_JOBS_EAGER = False
+# Tâche de fond sans avancement depuis ce délai (secondes) : signalée comme bloquée
+BULK_JOB_STALE_AFTER = 10 * 60
+
+# Commandes (core/orders.py) : durée de réservation du stock d'une commande non payée
+ORDER_RESERVATION_MINUTES = 30
+ORDER_SHIPPING_COSTS = {
+    'standard': Decimal('1500'),
+    'express': Decimal('3500'),
+    'overnight': Decimal('7500'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -197,6 +323,17 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Configuration des sessions
+# Avec un cache partagé, sessions lues depuis le cache et écrites en base
+# seulement quand elles changent. En mémoire locale, chaque worker garderait
+# sa propre copie (paniers divergents, session déconnectée encore valide
+# ailleurs) : les sessions sont alors lues en base.
+if SHARED_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 1209600  # 2 semaines
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+# Expiration glissante : au plus une réécriture toutes les 15 minutes
+# (voir core.middleware.SessionRefreshMiddleware)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_INTERVAL = 15 * 60